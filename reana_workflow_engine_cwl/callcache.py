@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Content-addressed cache of the outputs of CommandLineTool jobs."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+log = logging.getLogger(__name__)
+
+_checksums = {}
+_checksums_lock = threading.Lock()
+
+
+def file_checksum(path):
+    """Return the SHA-1 of a file's contents.
+
+    Checksums are remembered for as long as the file keeps its size and
+    modification time, so that inputs shared by many jobs are read once.
+    """
+    stat = os.stat(path)
+    signature = (path, stat.st_size, stat.st_mtime)
+    with _checksums_lock:
+        checksum = _checksums.get(signature)
+    if checksum is None:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        checksum = sha1.hexdigest()
+        with _checksums_lock:
+            _checksums[signature] = checksum
+    return checksum
+
+
+def path_checksum(path):
+    """Return a checksum of a file or of a directory tree's contents."""
+    if not os.path.isdir(path):
+        return file_checksum(path)
+    sha1 = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            sha1.update(os.path.relpath(full_path, path).encode('utf-8'))
+            sha1.update(file_checksum(full_path).encode('utf-8'))
+    return sha1.hexdigest()
+
+
+def _tree_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def _copy_tree_into(src, dst):
+    """Copy the contents of directory ``src`` into directory ``dst``."""
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if os.path.isdir(src_path):
+            if not os.path.isdir(dst_path):
+                os.makedirs(dst_path)
+            _copy_tree_into(src_path, dst_path)
+        else:
+            shutil.copy2(src_path, dst_path)
+
+
+class CallCache(object):
+    """Cache of job output directories, keyed by everything a job depends on.
+
+    Each entry is a directory named after the key, holding a copy of the
+    job's output directory and its size. Entries are evicted least recently
+    used first once the cache grows beyond ``max_size`` bytes. The cache may
+    be shared by several workers on the same volume: entries are created
+    atomically and a vanished entry is simply a miss.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(image, command, inputs, requirements):
+        """Compute the cache key of a job.
+
+        :param image: Container image the job runs in.
+        :param command: Command line of the job, with run-specific paths
+            replaced by placeholders.
+        :param inputs: Dictionary mapping the paths at which inputs are
+            seen by the job to checksums of their contents.
+        :param requirements: CWL requirements and hints of the tool.
+        """
+        description = json.dumps([image, command, inputs, requirements],
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key, outdir):
+        """Copy the cached outputs for ``key`` into ``outdir``.
+
+        The outputs are first copied aside, and only moved into ``outdir``
+        once all of them were, so that an entry evicted meanwhile by another
+        worker never leaves part of its outputs behind.
+
+        :returns: Whether there was an entry for ``key``.
+        """
+        entry = self._entry(key)
+        if not os.path.isdir(entry):
+            return False
+        staging = None
+        try:
+            os.utime(entry, None)
+            with open(os.path.join(entry, 'size')) as f:
+                size = int(f.read())
+            staging = tempfile.mkdtemp(prefix='.call-cache-', dir=outdir)
+            _copy_tree_into(os.path.join(entry, 'outputs'), staging)
+            if _tree_size(staging) != size:
+                raise IOError('entry removed while being copied')
+            for name in os.listdir(staging):
+                src_path = os.path.join(staging, name)
+                dst_path = os.path.join(outdir, name)
+                if os.path.isdir(dst_path):
+                    _copy_tree_into(src_path, dst_path)
+                else:
+                    os.rename(src_path, dst_path)
+        except (IOError, OSError, ValueError) as e:
+            log.warning('call cache entry %s unusable: %s', key, e)
+            return False
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, True)
+        return True
+
+    def store(self, key, outdir):
+        """Add the contents of ``outdir`` as the entry for ``key``.
+
+        Symbolic links are replaced by copies of what they point to, which
+        may be in a workspace removed before the entry is used.
+        """
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        staging = tempfile.mkdtemp(prefix='.' + key, dir=self.directory)
+        try:
+            shutil.copytree(outdir, os.path.join(staging, 'outputs'),
+                            symlinks=False)
+            size = _tree_size(os.path.join(staging, 'outputs'))
+            with open(os.path.join(staging, 'size'), 'w') as f:
+                f.write(str(size))
+            os.rename(staging, entry)
+        except (IOError, OSError, shutil.Error) as e:
+            log.warning('could not add call cache entry %s: %s', key, e)
+            shutil.rmtree(staging, True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries beyond the size limit."""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                entry = os.path.join(self.directory, name)
+                try:
+                    with open(os.path.join(entry, 'size')) as f:
+                        size = int(f.read())
+                    entries.append((os.stat(entry).st_mtime, size, entry))
+                except (IOError, OSError, ValueError):
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_size:
+                    break
+                shutil.rmtree(entry, True)
+                total -= size
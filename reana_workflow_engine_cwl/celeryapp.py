@@ -22,9 +22,15 @@
 
 from __future__ import absolute_import
 
-from celery import Celery
+import gc
+import logging
+import time
 
-from reana_workflow_engine_cwl.config import BROKER
+from celery import Celery, signals
+
+from reana_workflow_engine_cwl.config import BROKER, CWL_PRELOAD_VERSIONS
+
+log = logging.getLogger(__name__)
 
 app = Celery('tasks',
              broker=BROKER,
@@ -34,6 +40,28 @@ app = Celery('tasks',
 app.conf.update(CELERY_ACCEPT_CONTENT=['json'],
                 CELERY_TASK_SERIALIZER='json')
 
+
+@signals.worker_init.connect
+def preload_cwl(**kwargs):
+    """Import cwltool and compile the CWL schemas in the worker's parent.
+
+    The pool processes forked afterwards share them copy-on-write instead
+    of each loading them on its first workflow. The objects created so far
+    are then left out of garbage collection, whose bookkeeping would
+    otherwise write to, and so copy, the shared memory pages.
+    """
+    started = time.time()
+    import cwltool.main  # noqa: F401
+    from cwltool.process import get_schema
+    for version in CWL_PRELOAD_VERSIONS:
+        get_schema(version)
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    log.info('cwltool and CWL schemas %s preloaded in %.2fs',
+             ', '.join(CWL_PRELOAD_VERSIONS), time.time() - started)
+
+
 # ["worker", "-l", "info", "-Q", "${QUEUE_ENV}"]
 if __name__ == '__main__':
     app.start()
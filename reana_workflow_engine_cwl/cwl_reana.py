@@ -6,7 +6,10 @@ import pipes
 import re
 import shutil
 import tempfile
+import threading
 import time
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
 from pprint import pformat
 
 import shellescape
@@ -18,12 +21,53 @@ from cwltool.pathmapper import ensure_writable
 from cwltool.utils import get_feature
 from cwltool.workflow import defaultMakeTool
 
+from reana_workflow_engine_cwl import metrics
+from reana_workflow_engine_cwl.callcache import CallCache, path_checksum
+from reana_workflow_engine_cwl.config import (CALL_CACHE_DIRECTORY,
+                                              CALL_CACHE_ENABLED,
+                                              CALL_CACHE_MAX_SIZE,
+                                              JOB_STATUS_ZMQ_CONNECT,
+                                              POLL_BACKOFF_FACTOR,
+                                              POLL_FALLBACK_INTERVAL,
+                                              POLL_INITIAL_INTERVAL,
+                                              POLL_JITTER, POLL_MAX_INTERVAL,
+                                              POLL_USE_RUNTIME_HISTORY,
+                                              STAGING_STRATEGIES,
+                                              SUBMIT_BATCH_SIZE)
 from reana_workflow_engine_cwl.httpclient import ReanaJobControllerHTTPClient as HttpClient
+from reana_workflow_engine_cwl.pathtranslation import PathTranslator
 from reana_workflow_engine_cwl.pipeline import Pipeline, PipelineJob
-from reana_workflow_engine_cwl.poll import PollThread
+from reana_workflow_engine_cwl.poll import PollPolicy, PollThread
+from reana_workflow_engine_cwl.staging import (StagingMetrics, stage_file,
+                                               stage_tree)
+from reana_workflow_engine_cwl.zeromq_tracker import ZeroMQJobSubscriber
 
 log = logging.getLogger("cwl-backend")
 
+JOBS_SUBMITTED = metrics.counter(
+    'cwl_engine_jobs_submitted_total', 'Jobs submitted to the job controller.')
+SUBMIT_FAILURES = metrics.counter(
+    'cwl_engine_job_submit_failures_total',
+    'Jobs which could not be submitted to the job controller.')
+CALL_CACHE_HITS = metrics.counter(
+    'cwl_engine_call_cache_hits_total', 'Jobs whose outputs were cached.')
+STAGING_SECONDS = metrics.histogram(
+    'cwl_engine_job_staging_seconds', 'Time spent staging job inputs.')
+STAGED_BYTES = metrics.counter(
+    'cwl_engine_staged_bytes_total', 'Bytes of job inputs staged.',
+    ['method'])
+JOB_SECONDS = metrics.histogram(
+    'cwl_engine_job_seconds',
+    'Time from a job being ready to its outputs being collected.',
+    ['status'])
+STATUS_POLLS = metrics.counter(
+    'cwl_engine_status_polls_total', 'Job status checks.')
+POLL_SECONDS = metrics.histogram(
+    'cwl_engine_status_poll_seconds',
+    'Time taken to check the status of a batch of jobs.')
+POLL_FAILURES = metrics.counter(
+    'cwl_engine_status_poll_failures_total', 'Failed job status checks.')
+
 
 class ReanaPipeline(Pipeline):
 
@@ -36,6 +80,99 @@ class ReanaPipeline(Pipeline):
         else:
             self.basedir = os.getcwd()
         self.working_dir = working_dir
+        self.dispatched = []
+        self.job_timings = []
+        self.submit_batch_size = SUBMIT_BATCH_SIZE
+        self.poller = None
+        if CALL_CACHE_ENABLED:
+            self.call_cache = CallCache(CALL_CACHE_DIRECTORY,
+                                        CALL_CACHE_MAX_SIZE)
+        else:
+            self.call_cache = None
+        self.job_status_connect = JOB_STATUS_ZMQ_CONNECT
+        self.poll_policy = self.make_poll_policy()
+
+    def make_poll_policy(self):
+        """Return how to poll jobs, depending on whether states are pushed."""
+        policy = PollPolicy(initial_interval=POLL_INITIAL_INTERVAL,
+                            factor=POLL_BACKOFF_FACTOR,
+                            max_interval=POLL_MAX_INTERVAL,
+                            jitter=POLL_JITTER,
+                            use_history=POLL_USE_RUNTIME_HISTORY)
+        if self.job_status_connect:
+            # job state changes are pushed, polling is only a fallback
+            policy.initial_interval = POLL_FALLBACK_INTERVAL
+            policy.max_interval = max(POLL_FALLBACK_INTERVAL,
+                                      POLL_MAX_INTERVAL)
+        return policy
+
+    def get_poller(self):
+        """Return the thread polling the status of all jobs of the pipeline."""
+        if self.poller is None:
+            self.poller = ReanaPipelinePoll(service=self.service,
+                                            policy=self.poll_policy)
+            self.add_thread(self.poller)
+            self.poller.start()
+            if self.job_status_connect:
+                subscriber = ZeroMQJobSubscriber(self.job_status_connect,
+                                                 self.poller.notify)
+                self.add_thread(subscriber)
+                subscriber.start()
+        return self.poller
+
+    def dispatch(self, job, task, callback):
+        """Submit ``task`` for ``job`` and call ``callback`` once it is done.
+
+        Submission is deferred until :meth:`flush_dispatched` so that all
+        jobs becoming ready together are sent in one batch.
+        """
+        self.dispatched.append((job, task, callback))
+        if len(self.dispatched) >= self.submit_batch_size:
+            self.flush_dispatched()
+
+    def flush_dispatched(self):
+        batch, self.dispatched = self.dispatched, []
+        if not batch:
+            return
+        try:
+            task_ids = self.service.submit_many(
+                [task for _, task, _ in batch])
+        except Exception as e:
+            task_ids = [None] * len(batch)
+            error = e
+        else:
+            error = "no job id returned"
+            if len(task_ids) != len(batch):
+                log.error("job controller returned %d job ids for %d tasks" %
+                          (len(task_ids), len(batch)))
+                task_ids = (list(task_ids) + [None] * len(batch))[:len(batch)]
+        for (job, task, callback), task_id in zip(batch, task_ids):
+            if task_id is None:
+                SUBMIT_FAILURES.inc()
+                log.error(
+                    "[job %s] Failed to submit task to job controller:\n%s" %
+                    (job.name, error)
+                )
+                # the job fails like one which ran, so that the run goes on
+                self.job_started()
+                callback("permanentFail")
+                continue
+            log.info(
+                "[job %s] SUBMITTED TASK ----------------------" %
+                (job.name)
+            )
+            log.info("[job %s] task id: %s " % (job.name, task_id))
+            JOBS_SUBMITTED.inc()
+            self.job_started()
+            job.polled = self.get_poller().watch(
+                {'job_id': task_id, 'status': 'queued'}, callback,
+                name=job.name, key=job.spec.get("id"))
+
+    def wait(self):
+        try:
+            super(ReanaPipeline, self).wait()
+        finally:
+            self.service.close()
 
     def make_exec_tool(self, spec, **kwargs):
         return ReanaPipelineTool(spec, self, working_dir=self.working_dir, **kwargs)
@@ -47,6 +184,26 @@ class ReanaPipeline(Pipeline):
             return defaultMakeTool(spec, **kwargs)
 
 
+def secondary_file_pattern(glob, suffix):
+    """Return the pattern of the secondary files of the ``glob`` outputs.
+
+    ``suffix`` is applied as cwltool does, each leading ``^`` removing an
+    extension. ``None`` is returned if the pattern cannot be known before the
+    job has run: for expressions, and for extensions the glob does not spell
+    out.
+    """
+    if not isinstance(glob, (str, type(u""))) or \
+            not isinstance(suffix, (str, type(u""))) or \
+            "$(" in glob or "${" in glob or "$(" in suffix or "${" in suffix:
+        return None
+    while suffix.startswith("^"):
+        extension = glob.rfind(".")
+        if extension == -1 or re.search(r"[*?\[/]", glob[extension:]):
+            return None
+        glob, suffix = glob[:extension], suffix[1:]
+    return glob + suffix
+
+
 class ReanaPipelineTool(CommandLineTool):
 
     def __init__(self, spec, pipeline, working_dir, **kwargs):
@@ -77,6 +234,9 @@ class ReanaPipelineJob(PipelineJob):
         self.working_dir = working_dir
         self.inplace_update = False
         self.volumes = []
+        self.staging = StagingMetrics()
+        self.polled = None
+        self.timing = {}
 
     def add_volumes(self, pathmapper):
 
@@ -97,7 +257,8 @@ class ReanaPipelineJob(PipelineJob):
                 if self.inplace_update:
                     self.volumes.append((vol.resolved, vol.target))
                 else:
-                    shutil.copy(vol.resolved, host_outdir_tgt)
+                    stage_file(vol.resolved, host_outdir_tgt,
+                               STAGING_STRATEGIES, self.staging)
                     ensure_writable(host_outdir_tgt)
             if vol.type == "WritableDirectory":
                 if vol.resolved.startswith("_:"):
@@ -107,7 +268,8 @@ class ReanaPipelineJob(PipelineJob):
                     if self.inplace_update:
                         pass
                     else:
-                        shutil.copytree(vol.resolved, host_outdir_tgt)
+                        stage_tree(vol.resolved, host_outdir_tgt,
+                                   STAGING_STRATEGIES, self.staging)
                         ensure_writable(host_outdir_tgt)
             elif vol.type == "CreateFile":
                 if host_outdir_tgt:
@@ -118,18 +280,103 @@ class ReanaPipelineJob(PipelineJob):
                     with os.fdopen(fd, "wb") as f:
                         f.write(vol.resolved.encode("utf-8"))
 
+    def output_transfer_names(self, docker_output_dir):
+        """Return the names to move from ``docker_output_dir`` to the outdir.
+
+        Only the top-level entries which the output bindings of the tool,
+        their secondary files, the standard output and error of the tool and
+        ``cwl.output.json`` can match are moved. If a name cannot be known
+        before the job has run (expressions, unusual characters), everything
+        is moved.
+        """
+        patterns = ["cwl.output.json"]
+        for output in self.spec.get("outputs", []):
+            globs = (output.get("outputBinding") or {}).get("glob")
+            if globs is None:
+                continue
+            if not isinstance(globs, list):
+                globs = [globs]
+            secondary = output.get("secondaryFiles") or []
+            if not isinstance(secondary, list):
+                secondary = [secondary]
+            for glob in globs:
+                patterns.append(glob)
+                for suffix in secondary:
+                    patterns.append(secondary_file_pattern(glob, suffix))
+        for name in (self.stdout, self.stderr):
+            if name and not os.path.isabs(name):
+                patterns.append(name)
+        names = set()
+        for pattern in patterns:
+            if not isinstance(pattern, (str, type(u""))):
+                return ["*"]
+            if pattern.startswith(docker_output_dir + "/"):
+                pattern = pattern[len(docker_output_dir) + 1:]
+            if os.path.isabs(pattern) or \
+                    not re.match(r"^[\w.*?\[\]/-]+$", pattern):
+                return ["*"]
+            names.add(pattern.split("/")[0])
+        return sorted(names)
+
+    def path_translator(self, workdir, docker_output_dir):
+        """Build the translation of the paths cwltool gave this job.
+
+        - The output directory of the tool becomes ``workdir``, unless the
+          tool writes to a ``dockerOutputDirectory`` of its image.
+        - The temporary directory becomes the job's temporary directory.
+        - Staged inputs outside the workflow workspace, such as under
+          cwltool's default ``/var/lib/cwl``, exist only in a cwltool
+          container: they become the files they are staged from. Inputs
+          staged in the workspace are linked to from where they are staged,
+          and are left alone.
+        """
+        paths = PathTranslator()
+        workspace = os.path.dirname(self.working_dir) + "/"
+        for mapper in (getattr(self, "pathmapper", None),
+                       getattr(self, "generatemapper", None)):
+            if not mapper:
+                continue
+            for _, vol in mapper.items():
+                if vol.staged and vol.type in ("File", "Directory") and \
+                        not vol.resolved.startswith("_:") and \
+                        not vol.target.startswith(workspace):
+                    paths.add(vol.target, vol.resolved)
+        container_tmpdir = getattr(self.builder, "tmpdir", None)
+        tmpdir = getattr(self, "tmpdir", None)
+        if container_tmpdir and tmpdir:
+            paths.add(container_tmpdir, tmpdir)
+        if not docker_output_dir:
+            paths.add(self.builder.outdir, workdir)
+        return paths
+
     def create_task_msg(self):
 
         container = self.find_docker_requirement()
+        mounted_outdir = self.outdir
+        docker_output_dir = None
+        docker_req, _ = get_feature(self, "DockerRequirement")
+        if docker_req:
+            docker_output_dir = docker_req.get("dockerOutputDirectory", None)
+        if docker_output_dir:
+            workdir = docker_output_dir
+        else:
+            # the job works in its output directory, nothing to copy after
+            workdir = mounted_outdir
+
+        paths = self.path_translator(workdir, docker_output_dir)
         requirements_command_line = ""
         for var in self.environment:
-                requirements_command_line += "export {0}=\"{1}\";".format(var, self.environment[var])
+                value = self.environment[var]
+                if var == "HOME":
+                    value = workdir
+                requirements_command_line += "export {0}=\"{1}\";".format(var, value)
 
         if self.volumes:
-            for filepair in self.volumes:
-                requirements_command_line += "ln -s {0} {1} ;".format(filepair[0], filepair[1])
+            for src, target in self.volumes:
+                target = paths.translate_path(target)
+                if target != src:
+                    requirements_command_line += "ln -s {0} {1} ;".format(src, target)
 
-        mounted_outdir = self.outdir
         # if mounted_outdir.startswith("/tmp"):
         #     mounted_outdir = re.sub("/tmp/.*?/.*?/", self.working_dir + "/", mounted_outdir)
         scr, _ = get_feature(self, "ShellCommandRequirement")
@@ -146,15 +393,14 @@ class ReanaPipelineJob(PipelineJob):
                 shellQuote = b.get("shellQuote")
                 break
 
+        arguments = [paths.translate(arg) for arg in self.command_line]
         command_line = " ".join([shellescape.quote(arg) if shouldquote(arg) else  arg for arg in
-                                       self.command_line])
+                                       arguments])
         command_line = command_line.replace('/bin/sh -c ', '')
-        command_line = re.sub("/var/lib/cwl/.*?/", "/".join(self.working_dir.split("/")[:-1]) + "/workspace/", command_line)
-        command_line = re.sub("/tmp/.*?/.*?/", self.working_dir + "/", command_line)
         if self.stdin:
             path = self.stdin.split("/")
             if os.path.isabs(self.stdin):
-                command_line = command_line + " < {0}".format(self.stdin)
+                command_line = command_line + " < {0}".format(paths.translate_path(self.stdin))
             else:
                 if len(path) > 1:
                     parent_dir = "/".join(mounted_outdir.split("/")[:-1])
@@ -163,28 +409,31 @@ class ReanaPipelineJob(PipelineJob):
                     command_line = command_line + " < {0}".format(os.path.join(mounted_outdir, path))
         if self.stdout:
             if os.path.isabs(self.stdout):
-                command_line = command_line + " > {0}".format(self.stdout)
+                command_line = command_line + " > {0}".format(paths.translate_path(self.stdout))
             else:
-                command_line = command_line + " > {0}".format(os.path.join(self.environment["HOME"], self.stdout))
+                command_line = command_line + " > {0}".format(os.path.join(workdir, self.stdout))
         if self.stderr:
             if os.path.isabs(self.stderr):
-                stderr = self.stderr
+                stderr = paths.translate_path(self.stderr)
             else:
                 stderr = os.path.join(mounted_outdir, self.stderr)
             command_line += " 2> " + stderr
             if scr and not shellQuote:
                 command_line = command_line.replace("&2", stderr)
 
-        wf_space_cmd = "mkdir -p {0} && cd {0} && ".format(self.environment["HOME"]) + command_line
+        wf_space_cmd = "mkdir -p {0} && cd {0} && ".format(workdir) + command_line
         wf_space_cmd = requirements_command_line + wf_space_cmd
 
-        docker_output_dir = None
-        docker_req, _ = get_feature(self, "DockerRequirement")
-        if docker_req:
-            docker_output_dir = docker_req.get("dockerOutputDirectory", None)
         if docker_output_dir:
-            wf_space_cmd = "mkdir -p {0} && {1} ; cp -r {0} {2}".format(docker_output_dir, wf_space_cmd, mounted_outdir)
-        wf_space_cmd += "; cp -r {0}/* {1}".format(self.environment['HOME'], mounted_outdir)
+            # If the image does not provide the directory, it becomes a link
+            # to the outdir. Otherwise the outputs are moved out of it.
+            wf_space_cmd = (
+                "[ -e {0} ] || {{ mkdir -p {1} && ln -s {2} {0}; }} ; "
+                "{3} ; rc=$? ; [ -L {0} ] || {{ cd {0} && "
+                "mv -f {4} {2}/ 2>/dev/null; }} ; exit $rc").format(
+                    docker_output_dir, os.path.dirname(docker_output_dir),
+                    mounted_outdir, wf_space_cmd,
+                    " ".join(self.output_transfer_names(docker_output_dir)))
         wrapped_cmd = "/bin/sh -c {} ".format(pipes.quote(wf_space_cmd))
 
         create_body = {
@@ -198,6 +447,7 @@ class ReanaPipelineJob(PipelineJob):
     def run(self, pull_image=True, rm_container=True, rm_tmpdir=True,
             move_outputs="move", **kwargs):
 
+        self.timing["queued"] = time.time()
         self._setup(kwargs)
 
         env = self.environment
@@ -217,6 +467,7 @@ class ReanaPipelineJob(PipelineJob):
         if "SYSTEMROOT" not in env and "SYSTEMROOT" in os.environ:
             env["SYSTEMROOT"] = os.environ["SYSTEMROOT"]
 
+        staging_started = time.time()
         stageFiles(self.pathmapper, ignoreWritable=True, symLink=True)
         if getattr(self, "generatemapper",""):
             stageFiles(self.generatemapper, ignoreWritable=self.inplace_update, symLink=False)
@@ -225,6 +476,11 @@ class ReanaPipelineJob(PipelineJob):
         self.add_volumes(self.pathmapper)
         if getattr(self, "generatemapper",""):
             self.add_volumes(self.generatemapper)
+        self.timing["staging_time"] = time.time() - staging_started
+        STAGING_SECONDS.observe(self.timing["staging_time"])
+        STAGED_BYTES.inc(self.staging.bytes_copied, method="copied")
+        STAGED_BYTES.inc(self.staging.bytes_linked, method="linked")
+        log.info("[job %s] staged inputs: %s" % (self.name, self.staging))
 
         # useful for debugging
         log.debug(
@@ -241,24 +497,28 @@ class ReanaPipelineJob(PipelineJob):
         )
         log.info(pformat(task))
 
-        try:
-            task_id = self.pipeline.service.submit(**task)
-            log.info(
-                "[job %s] SUBMITTED TASK ----------------------" %
-                (self.name)
-            )
-            log.info("[job %s] task id: %s " % (self.name, task_id))
-            operation = self.pipeline.service.check_status(task_id)
-        except Exception as e:
-            log.error(
-                "[job %s] Failed to submit task to job controller:\n%s" %
-                (self.name, e)
-            )
-            return WorkflowException(e)
+        call_cache = self.pipeline.call_cache
+        cache_key = None
+        if call_cache is not None:
+            try:
+                cache_key = self.call_cache_key(task)
+            except Exception as e:
+                log.error("[job %s] cannot compute call cache key: %s" %
+                          (self.name, e))
 
-        def callback():
+        def callback(status=None):
             try:
+                if status is None:
+                    raise WorkflowException(
+                        "status of the job could not be retrieved")
+                if status == "permanentFail":
+                    raise WorkflowException("job could not be submitted")
+                if status == "failed":
+                    raise WorkflowException("job failed")
+                collection_started = time.time()
                 outputs = self.collect_outputs(self.outdir)
+                self.timing["collection_time"] = \
+                    time.time() - collection_started
                 cleaned_outputs = {}
                 for k, v in outputs.items():
                     if isinstance(k, bytes):
@@ -267,6 +527,15 @@ class ReanaPipelineJob(PipelineJob):
                         v = v.decode("utf8")
                     cleaned_outputs[k] = v
                 self.outputs = cleaned_outputs
+                if cache_key is not None and status == "succeeded":
+                    # copied aside not to hold up the status poller; the
+                    # pipeline waits for it before relocating outputs
+                    storing = threading.Thread(
+                        target=call_cache.store,
+                        args=(cache_key, self.outdir),
+                        name="reana-call-cache-store")
+                    self.pipeline.add_thread(storing)
+                    storing.start()
                 self.output_callback(self.outputs, "success")
             except WorkflowException as e:
                 log.error("[job %s] job error:\n%s" % (self.name, e))
@@ -282,16 +551,103 @@ class ReanaPipelineJob(PipelineJob):
                     )
                     log.info(pformat(self.outputs))
                 self.cleanup(rm_tmpdir)
+                try:
+                    JOB_SECONDS.observe(time.time() - self.timing["queued"],
+                                        status=status or "unknown")
+                    self.pipeline.job_timings.append(
+                        self.timing_record(status))
+                except Exception as e:
+                    log.error("[job %s] cannot record timing: %s" %
+                              (self.name, e))
+                self.pipeline.job_finished()
+
+        if cache_key is not None and call_cache.lookup(cache_key, self.outdir):
+            log.info("[job %s] CALL CACHE HIT %s" % (self.name, cache_key))
+            CALL_CACHE_HITS.inc()
+            self.pipeline.job_started()
+            callback("cached")
+            return
+
+        return self.pipeline.dispatch(self, task, callback)
+
+    def timing_record(self, status):
+        """Return the row of the job in the job timing table."""
+        def timestamp(seconds):
+            if seconds is None:
+                return None
+            return datetime.utcfromtimestamp(seconds)
+
+        submitted = started = job_id = None
+        poll_count = 0
+        finished = time.time()
+        if self.polled is not None:
+            job_id = self.polled.id
+            submitted = self.polled.started
+            poll_count = self.polled.polls
+            transitions = self.polled.transitions
+            running = [seen for state, seen in transitions.items()
+                       if state not in ("queued", "succeeded", "failed")]
+            if running:
+                started = min(running)
+            finished = transitions.get(status, finished)
+        return {
+            "step_name": self.name,
+            "job_id": job_id,
+            "image": self.find_docker_requirement(),
+            "queued": timestamp(self.timing.get("queued")),
+            "submitted": timestamp(submitted),
+            "started": timestamp(started),
+            "finished": timestamp(finished),
+            "staging_time": self.timing.get("staging_time"),
+            "collection_time": self.timing.get("collection_time"),
+            "bytes_staged": (self.staging.bytes_copied +
+                             self.staging.bytes_linked),
+            "poll_count": poll_count,
+            "status": status or "unknown",
+        }
 
-        poll = ReanaPipelinePoll(
-            jobname=self.name,
-            service=self.pipeline.service,
-            operation=operation,
-            callback=callback
-        )
-
-        self.pipeline.add_thread(poll)
-        poll.start()
+    def call_cache_key(self, task):
+        """Compute the call cache key of the job described by ``task``.
+
+        Paths which differ between runs of the same workflow (output and
+        temporary directories, the workflow workspace, the directories
+        cwltool stages inputs in) are replaced by placeholders, and inputs
+        are identified by their contents.
+        """
+        placeholders = [
+            (self.outdir, "$OUTDIR"),
+            (self.tmpdir, "$TMPDIR"),
+            (os.path.dirname(self.working_dir), "$WORKSPACE"),
+        ]
+        volumes = []
+        mappers = [self.pathmapper, getattr(self, "generatemapper", None)]
+        for mapper in mappers:
+            if not mapper:
+                continue
+            volumes.extend(vol for _, vol in mapper.items())
+        # inputs are staged in randomly named directories: number them in
+        # an order which does not depend on these names
+        for n, vol in enumerate(sorted(
+                volumes, key=lambda vol: (vol.resolved, vol.target))):
+            placeholders.append((vol.target, "$INPUT{0}/{1}".format(
+                n, os.path.basename(vol.target))))
+        placeholders.sort(key=lambda placeholder: len(placeholder[0]),
+                          reverse=True)
+
+        def normalize(text):
+            for path, placeholder in placeholders:
+                text = text.replace(path, placeholder)
+            return text
+
+        inputs = {}
+        for vol in volumes:
+            if vol.type == "CreateFile":
+                inputs[normalize(vol.target)] = vol.resolved
+            elif not vol.resolved.startswith("_:"):
+                inputs[normalize(vol.target)] = path_checksum(vol.resolved)
+
+        return CallCache.key(task["image"], normalize(task["cmd"]), inputs,
+                             [self.requirements, self.hints])
 
     def cleanup(self, rm_tmpdir):
         log.debug(
@@ -315,60 +671,69 @@ class ReanaPipelineJob(PipelineJob):
 
 class ReanaPipelinePoll(PollThread):
 
-    def __init__(self, jobname, service, operation, callback):
-        super(ReanaPipelinePoll, self).__init__(operation)
-        self.name = jobname
+    def __init__(self, service, log_workers=2, **kwargs):
+        super(ReanaPipelinePoll, self).__init__(**kwargs)
+        self.name = "reana-pipeline-poll"
         self.service = service
-        self.callback = callback
+        self.log_workers = log_workers
+        self.log_pool = None
 
     def run(self):
-        while not self.is_done(self.operation):
-            time.sleep(self.poll_interval)
-            # slow down polling over time till it hits a max
-            # if self.poll_interval < 30:
-            #     self.poll_interval += 1
-            log.debug(
-                "[job %s] POLLING %s" %
-                (self.name, pformat(self.id))
-            )
-            try:
-                self.operation = self.poll()
-            except Exception as e:
-                log.error("[job %s] POLLING ERROR %s" % (self.name, e))
-                if self.poll_retries > 0:
-                    self.poll_retries -= 1
-                    continue
-                else:
-                    log.error("[job %s] MAX POLLING RETRIES EXCEEDED" %
-                              (self.name))
-                    break
-
-        self.complete(self.operation)
-
-    def poll(self):
-        return self.service.check_status(self.id)
-
-    def is_done(self, operation):
+        try:
+            super(ReanaPipelinePoll, self).run()
+        finally:
+            # the logs of failed jobs are written before the pipeline ends
+            if self.log_pool is not None:
+                self.log_pool.close()
+                self.log_pool.join()
+
+    def fetch_logs(self, polled):
+        """Log the logs of a failed job without holding up polling."""
+        if self.log_pool is None:
+            self.log_pool = ThreadPool(self.log_workers)
+        self.log_pool.apply_async(self.log_job_logs, (polled.name, polled.id))
+
+    def log_job_logs(self, name, job_id):
+        try:
+            logs = self.service.get_logs(job_id)
+        except Exception as e:
+            log.error("[job %s] cannot fetch logs: %s" % (name, e))
+            return
+        log.error("[job %s] logs: %s" % (name, logs))
+
+    def poll(self, job_ids):
+        log.debug("POLLING %s" % pformat(job_ids))
+        STATUS_POLLS.inc(len(job_ids))
+        with POLL_SECONDS.time():
+            return self.service.check_status_many(job_ids)
+
+    def poll_failed(self, batch, error):
+        POLL_FAILURES.inc(len(batch))
+        log.error("POLLING ERROR %s" % error)
+
+    def is_done(self, polled):
+        operation = polled.operation
         terminal_states = ["succeeded", "failed"]
         if operation['status'] in terminal_states:
             log.info(
                 "[job %s] FINAL JOB STATE: %s ------------------" %
-                (self.name, operation['status'])
+                (polled.name, operation['status'])
             )
-            if operation['status'] != "failed":
+            if operation['status'] == "failed":
                 log.error(
-                    "[job %s] task id: %s" % (self.name, self.id)
-                )
-                log.error(
-                    "[job %s] logs: %s" %
-                    (
-                        self.name,
-                        self.service.get_logs(self.id)
-                    )
-
+                    "[job %s] task id: %s" % (polled.name, polled.id)
                 )
+                self.fetch_logs(polled)
             return True
         return False
 
-    def complete(self, operation):
-        self.callback()
+    def complete(self, polled):
+        status = polled.operation.get('status')
+        if polled.retries < 0:
+            log.error("[job %s] MAX POLLING RETRIES EXCEEDED" %
+                      (polled.name))
+            # the last known status is not the final one
+            status = None
+        log.info("[job %s] status polled %d times" %
+                 (polled.name, polled.polls))
+        polled.callback(status)
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Asyncio execution mode of the REANA CWL pipeline.
+
+Submission, status polling and log retrieval of all jobs of a workflow run
+as coroutines on a single event loop instead of one thread per job. This
+module requires Python 3 and ``aiohttp`` and is only imported when the
+``asyncio`` execution mode is selected.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from reana_workflow_engine_cwl.config import (JOBCONTROLLER_CONNECT_TIMEOUT,
+                                              JOBCONTROLLER_HOST,
+                                              JOBCONTROLLER_POOL_SIZE,
+                                              JOBCONTROLLER_READ_TIMEOUT)
+from reana_workflow_engine_cwl.cwl_reana import ReanaPipeline
+from reana_workflow_engine_cwl.poll import PolledOperation
+
+log = logging.getLogger("cwl-backend")
+
+
+class AsyncReanaJobControllerHTTPClient(object):
+    """Coroutine counterpart of ``ReanaJobControllerHTTPClient``."""
+
+    def __init__(self, host=JOBCONTROLLER_HOST,
+                 pool_size=JOBCONTROLLER_POOL_SIZE,
+                 connect_timeout=JOBCONTROLLER_CONNECT_TIMEOUT,
+                 read_timeout=JOBCONTROLLER_READ_TIMEOUT):
+        self.host = host
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.bulk_status_supported = True
+        self.session = None
+
+    async def open(self):
+        """Open the connection pool; must be awaited on the loop using it."""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def submit(self, experiment, image, cmd):
+        job_spec = {
+            'experiment': experiment,
+            'docker_img': image,
+            'cmd': cmd,
+            'max_restart_count': 0,
+            'env_vars': {}
+        }
+
+        log.info('submitting %s', json.dumps(job_spec, indent=4,
+                                             sort_keys=True))
+
+        async with self.session.post(
+                'http://{host}/{resource}'.format(
+                    host=self.host,
+                    resource='jobs'
+                ),
+                json=job_spec) as response:
+            return str((await response.json())['job_id'])
+
+    async def check_status(self, job_id):
+        async with self.session.get(
+                'http://{host}/{resource}/{id}'.format(
+                    host=self.host,
+                    resource='jobs',
+                    id=job_id
+                ),
+                headers={'cache-control': 'no-cache'}) as response:
+            return (await response.json())['job']
+
+    async def check_status_many(self, job_ids):
+        """Check the status of many jobs in one request, if possible.
+
+        Jobs the batch status endpoint does not answer for, or all jobs if
+        the job controller does not provide it, are checked one by one
+        concurrently. Jobs whose status could not be retrieved are left out
+        of the result.
+        """
+        job_ids = list(job_ids)
+        statuses = {}
+        if self.bulk_status_supported and job_ids:
+            try:
+                jobs = await self._check_status_batch(job_ids)
+            except Exception as e:
+                log.error('checking status of jobs failed: %s', e)
+                jobs = None
+            if jobs is not None:
+                statuses = dict((job_id, jobs[job_id])
+                                for job_id in job_ids if job_id in jobs)
+
+        missing = [job_id for job_id in job_ids if job_id not in statuses]
+        results = await asyncio.gather(
+            *[self.check_status(job_id) for job_id in missing],
+            return_exceptions=True)
+        for job_id, job_info in zip(missing, results):
+            if isinstance(job_info, Exception):
+                log.error('checking status of job %s failed: %s',
+                          job_id, job_info)
+            else:
+                statuses[job_id] = job_info
+        return statuses
+
+    async def _check_status_batch(self, job_ids):
+        async with self.session.post(
+                'http://{host}/{resource}'.format(
+                    host=self.host,
+                    resource='jobs/status'
+                ),
+                json={'job_ids': job_ids},
+                headers={'cache-control': 'no-cache'}) as response:
+            if response.status in (404, 405, 501):
+                log.info('job controller cannot check the status of many '
+                         'jobs, checking job status one by one')
+                self.bulk_status_supported = False
+                return None
+            response.raise_for_status()
+            return dict((str(job_id), job_info) for job_id, job_info
+                        in (await response.json())['jobs'].items())
+
+    async def get_logs(self, job_id):
+        async with self.session.get(
+                'http://{host}/{resource}/{id}/logs'.format(
+                    host=self.host,
+                    resource='jobs',
+                    id=job_id
+                ),
+                headers={'cache-control': 'no-cache'}) as response:
+            return await response.text()
+
+
+class AsyncReanaPipeline(ReanaPipeline):
+    """Pipeline driving all of its jobs from one asyncio event loop.
+
+    The event loop runs in a background thread. cwltool's executor keeps
+    running synchronously: :meth:`dispatch` hands each job over to the loop,
+    and job callbacks, which call back into cwltool, are run one at a time
+    on a separate thread so that they never block the loop. The jobs due
+    for a status check within ``status_batch_window`` seconds of each other
+    are checked together.
+    """
+
+    def __init__(self, working_dir, kwargs):
+        super(AsyncReanaPipeline, self).__init__(working_dir, kwargs)
+        self.async_service = AsyncReanaJobControllerHTTPClient()
+        self.loop = None
+        self.loop_thread = None
+        self.callback_executor = None
+        self.poll_retries = 10
+        self.status_batch_window = 0.05
+        self.status_waiters = {}
+        self.status_cycle = None
+        if self.job_status_connect:
+            # nothing pushes job states in this mode: poll with backoff
+            log.warning("job status notifications are not supported in "
+                        "asyncio mode, jobs are polled")
+            self.job_status_connect = None
+            self.poll_policy = self.make_poll_policy()
+
+    def start_loop(self):
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                            name="reana-pipeline-loop")
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+        self.callback_executor = ThreadPoolExecutor(max_workers=1)
+        asyncio.run_coroutine_threadsafe(self.async_service.open(),
+                                         self.loop).result()
+
+    def stop_loop(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.async_service.close(),
+                                         self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+        self.callback_executor.shutdown()
+        self.loop = None
+
+    def dispatch(self, job, task, callback):
+        self.start_loop()
+        self.job_started()
+        asyncio.run_coroutine_threadsafe(self.run_job(job, task, callback),
+                                         self.loop)
+
+    def wait(self):
+        super(AsyncReanaPipeline, self).wait()
+        self.stop_loop()
+
+    async def run_job(self, job, task, callback):
+        try:
+            task_id = await self.async_service.submit(**task)
+        except Exception as e:
+            log.error(
+                "[job %s] Failed to submit task to job controller:\n%s" %
+                (job.name, e)
+            )
+            # the job fails like one which ran, so that the run goes on
+            await self.loop.run_in_executor(self.callback_executor, callback,
+                                            "permanentFail")
+            return
+        log.info("[job %s] task id: %s " % (job.name, task_id))
+
+        key = job.spec.get("id")
+        polled = PolledOperation({'job_id': task_id, 'status': 'queued'},
+                                 callback, name=job.name, key=key,
+                                 retries=self.poll_retries,
+                                 interval=self.poll_policy.first_interval(key))
+        job.polled = polled
+        status = None
+        try:
+            status = await self.poll_job(polled)
+            self.poll_policy.record(key, time.time() - polled.started)
+        except Exception as e:
+            # the pipeline waits for the callback, so always reach it
+            log.error("[job %s] POLLING FAILED %s" % (job.name, e))
+        await self.loop.run_in_executor(self.callback_executor, callback,
+                                        status)
+
+    async def poll_job(self, polled):
+        """Poll the job controller until the job is over.
+
+        :returns: The final status of the job, or ``None`` if unknown.
+        """
+        policy = self.poll_policy
+        interval = polled.interval
+        status = None
+        while True:
+            await asyncio.sleep(policy.jittered(interval))
+            interval = policy.next_interval(interval)
+            polled.polls += 1
+            try:
+                operation = await self.check_status(polled.id)
+            except Exception as e:
+                log.error("[job %s] POLLING ERROR %s" % (polled.name, e))
+                polled.retries -= 1
+                if polled.retries < 0:
+                    log.error("[job %s] MAX POLLING RETRIES EXCEEDED" %
+                              (polled.name))
+                    break
+                continue
+            polled.observe(operation)
+            if operation['status'] in ("succeeded", "failed"):
+                log.info(
+                    "[job %s] FINAL JOB STATE: %s ------------------" %
+                    (polled.name, operation['status'])
+                )
+                if operation['status'] == "failed":
+                    log.error(
+                        "[job %s] logs: %s" %
+                        (polled.name,
+                         await self.async_service.get_logs(polled.id))
+                    )
+                status = operation['status']
+                break
+        log.info("[job %s] status polled %d times" % (polled.name,
+                                                      polled.polls))
+        return status
+
+    async def check_status(self, job_id):
+        """Return the status of ``job_id``.
+
+        The check is deferred by ``status_batch_window`` seconds and made
+        along with the checks of the other jobs due meanwhile.
+        """
+        future = self.loop.create_future()
+        self.status_waiters.setdefault(job_id, []).append(future)
+        if self.status_cycle is None:
+            self.status_cycle = self.loop.create_task(
+                self.check_status_cycle())
+        return await future
+
+    async def check_status_cycle(self):
+        await asyncio.sleep(self.status_batch_window)
+        waiters, self.status_waiters = self.status_waiters, {}
+        self.status_cycle = None
+        try:
+            statuses = await self.async_service.check_status_many(waiters)
+        except Exception as e:
+            statuses = {}
+            error = e
+        else:
+            error = Exception("no status returned")
+        for job_id, futures in waiters.items():
+            for future in futures:
+                if job_id in statuses:
+                    future.set_result(statuses[job_id])
+                else:
+                    future.set_exception(error)
@@ -24,41 +24,104 @@
 
 from __future__ import absolute_import
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from celery import signals
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
 
-from reana_workflow_engine_cwl.config import SQLALCHEMY_DATABASE_URI
+from reana_workflow_engine_cwl.config import (LOG_BUFFER_CAPACITY,
+                                              LOG_FLUSH_INTERVAL,
+                                              SQLALCHEMY_DATABASE_URI,
+                                              SQLITE_BUSY_TIMEOUT,
+                                              SQLITE_JOURNAL_MODE)
 
-from reana_workflow_engine_cwl.models import User, Workflow  # isort:skip  # noqa
+from reana_workflow_engine_cwl.models import Base, JobTiming, User, Workflow, WorkflowLog  # isort:skip  # noqa
 
 from logging import StreamHandler
 
+engine = None
+"""Database engine of this process, created by :func:`init_engine`."""
+
+Session = scoped_session(sessionmaker())
+"""Registry of the database session of each thread."""
+
+
+def configure_sqlite(dbapi_connection, connection_record):
+    """Tune new SQLite connections for several concurrent workers."""
+    cursor = dbapi_connection.cursor()
+    if SQLITE_JOURNAL_MODE:
+        cursor.execute('PRAGMA journal_mode={0}'.format(SQLITE_JOURNAL_MODE))
+    cursor.execute('PRAGMA busy_timeout={0:d}'.format(SQLITE_BUSY_TIMEOUT))
+    cursor.close()
+
+
+def init_engine(database_uri=SQLALCHEMY_DATABASE_URI):
+    """Create the database engine of this process.
+
+    Connections of a previous engine, such as one inherited from the parent
+    process of a Celery worker, are not reused.
+    """
+    global engine
+    if engine is not None:
+        engine.dispose()
+    engine = create_engine(database_uri)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', configure_sqlite)
+    Base.metadata.create_all(engine, tables=[WorkflowLog.__table__,
+                                             JobTiming.__table__])
+    Session.remove()
+    Session.configure(bind=engine)
+    return engine
+
+
+def reset_engine(**kwargs):
+    init_engine()
+
+
+signals.worker_process_init.connect(reset_engine)
+
+
 def load_session():
-    """Load SQLAlchemy database session."""
-    engine = create_engine(SQLALCHEMY_DATABASE_URI)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    return session
+    """Load SQLAlchemy database session.
+
+    The session is the one of the current thread until
+    :func:`remove_session` is called.
+    """
+    if engine is None:
+        init_engine()
+    return Session()
+
+
+def remove_session():
+    """Close the session of the current thread."""
+    Session.remove()
 
 
 import logging
+import re
 import time
+from datetime import datetime
+
+JOB_NAME_RE = re.compile(r"^\[job ([^\]]+)\]")
+"""Prefix of the log messages about a job, as used by cwltool."""
 
 
 class SQLiteHandler(StreamHandler):
     """
-    Logging handler for SQLite.
-    Based on Vinay Sajip's DBHandler class (http://www.red-dove.com/python_logging.html)
-
-    This version sacrifices performance for thread-safety:
-    Instead of using a persistent cursor, we open/close connections for each entry.
-
-    AFAIK this is necessary in multi-threaded applications,
-    because SQLite doesn't allow access to objects across threads.
+    Logging handler writing the logs of a workflow to the database.
+
+    Each record becomes a line of the ``workflow_log`` table. Records are
+    written to ``stream`` as they come, but kept in a buffer which is
+    inserted into the database in a single statement once it holds
+    ``capacity`` records, once ``flush_interval`` seconds have passed since
+    the last write, as soon as a record of level ``flush_level`` or above
+    comes (so that the reason of a failure is never lost), and when the
+    handler is closed.
     """
 
-
-    def __init__(self, db_session, workflow_uuid, stream=None):
+    def __init__(self, db_session, workflow_uuid, stream=None,
+                 capacity=LOG_BUFFER_CAPACITY,
+                 flush_interval=LOG_FLUSH_INTERVAL,
+                 flush_level=logging.ERROR):
         """
         Initialize the handler.
 
@@ -67,57 +130,87 @@ class SQLiteHandler(StreamHandler):
         StreamHandler.__init__(self, stream)
         self.workflow_uuid = workflow_uuid
         self.db_session = db_session
-
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.buffer = []
+        self.last_write = time.time()
+        self.sequence = None
 
     def formatDBTime(self, record):
         record.dbtime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
 
+    def should_write(self, record):
+        """Tell whether the buffer is to be written after ``record``."""
+        return (len(self.buffer) >= self.capacity or
+                record.levelno >= self.flush_level or
+                time.time() - self.last_write >= self.flush_interval)
+
     def emit(self, record):
         """
         Emit a record.
 
-        If a formatter is specified, it is used to format the record.
-        The record is then written to the stream with a trailing newline.  If
-        exception information is present, it is formatted using
-        traceback.print_exception and appended to the stream.  If the stream
-        has an 'encoding' attribute, it is used to determine how to do the
-        output to the stream.
+        The formatted record is written to the stream with a trailing
+        newline and added to the buffer of records to write to the database.
         """
         try:
             msg = self.format(record)
-            stream = self.stream
-            fs = "%s\n"
-            if not logging._unicode:  # if no unicode support...
-                stream.write(fs % msg)
-                Workflow.append_workflow_logs(self.db_session, self.workflow_uuid, "/n" + msg)
-            else:
-                try:
-                    if (isinstance(msg, unicode) and
-                            getattr(stream, 'encoding', None)):
-                        ufs = u'%s\n'
-                        try:
-                            stream.write(ufs % msg)
-                            Workflow.append_workflow_logs(self.db_session, self.workflow_uuid, msg)
-
-                        except UnicodeEncodeError:
-                            # Printing to terminals sometimes fails. For example,
-                            # with an encoding of 'cp1251', the above write will
-                            # work if written to a stream opened or wrapped by
-                            # the codecs module, but fail when writing to a
-                            # terminal even when the codepage is set to cp1251.
-                            # An extra encoding step seems to be needed.
-                            stream.write((ufs % msg).encode(stream.encoding))
-                            Workflow.append_workflow_logs(self.db_session, self.workflow_uuid, msg)
-
-                    else:
-                        stream.write(fs % msg)
-                        Workflow.append_workflow_logs(self.db_session, self.workflow_uuid, msg)
-
-                except UnicodeError:
-                    stream.write(fs % msg.encode("UTF-8"))
-                    Workflow.append_workflow_logs(self.db_session, self.workflow_uuid, msg.encode("UTF-8"))
-            self.flush()
+            try:
+                self.stream.write(u"%s\n" % msg)
+            except UnicodeError:
+                self.stream.write((u"%s\n" % msg).encode("UTF-8"))
+            job_name = getattr(record, "job_name", None)
+            if job_name is None:
+                match = JOB_NAME_RE.match(record.getMessage())
+                if match:
+                    job_name = match.group(1)
+            if self.sequence is None:
+                self.sequence = WorkflowLog.next_sequence(self.db_session,
+                                                          self.workflow_uuid)
+            self.buffer.append({
+                "sequence": self.sequence,
+                "created": datetime.utcfromtimestamp(record.created),
+                "level": record.levelname,
+                "job_name": job_name,
+                "text": msg,
+            })
+            self.sequence += 1
+            if self.should_write(record):
+                self.write_logs()
         except (KeyboardInterrupt, SystemExit):
             raise
-        except:
+        except Exception:
             self.handleError(record)
+
+    def write_logs(self):
+        """Write the buffered records to the database in one transaction.
+
+        If writing fails, the records stay in the buffer for the next try.
+        """
+        self.acquire()
+        try:
+            records, self.buffer = self.buffer, []
+            if records:
+                try:
+                    WorkflowLog.append_workflow_logs(
+                        self.db_session, self.workflow_uuid, records)
+                except Exception:
+                    self.db_session.rollback()
+                    self.buffer[:0] = records
+                    raise
+            self.last_write = time.time()
+        finally:
+            self.release()
+
+    def flush(self):
+        """Flush the stream, and the buffer if it is due to be written."""
+        StreamHandler.flush(self)
+        if time.time() - self.last_write >= self.flush_interval:
+            self.write_logs()
+
+    def close(self):
+        """Write the remaining records and close the handler."""
+        try:
+            self.write_logs()
+        finally:
+            StreamHandler.close(self)
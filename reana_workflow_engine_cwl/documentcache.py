@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Cache of resolved and validated CWL documents."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pkg_resources
+from cwltool.process import get_schema
+from schema_salad.ref_resolver import Loader
+from schema_salad.sourceline import cmap
+
+from reana_workflow_engine_cwl import metrics
+
+log = logging.getLogger(__name__)
+
+DOCUMENT_CACHE_HITS = metrics.counter(
+    'cwl_engine_document_cache_hits_total',
+    'Workflow documents whose validation was answered from the cache.')
+DOCUMENT_CACHE_MISSES = metrics.counter(
+    'cwl_engine_document_cache_misses_total',
+    'Workflow documents validated and added to the cache.')
+
+BASE_PLACEHOLDER = 'reana-cwl-document-base:/'
+"""Stands for the directory of the document in cached documents."""
+
+EXTERNAL_REFERENCE_RE = re.compile(r'"\$(import|include|mixin|schemas)"')
+"""Directives making a document depend on other files than itself."""
+
+
+def _version(distribution):
+    try:
+        return pkg_resources.get_distribution(distribution).version
+    except pkg_resources.DistributionNotFound:
+        return 'unknown'
+
+
+def _register_ids(loader, obj):
+    """Index every object of a resolved document under its identifier."""
+    if isinstance(obj, dict):
+        for identifier in loader.identifiers:
+            if identifier in obj:
+                loader.idx[obj[identifier]] = obj
+        for value in obj.values():
+            _register_ids(loader, value)
+    elif isinstance(obj, list):
+        for value in obj:
+            _register_ids(loader, value)
+
+
+class DocumentCache(object):
+    """Cache of the results of cwltool's ``validate_document``.
+
+    Loading and validating a workflow with schema-salad takes seconds for
+    large workflows, and the same workflow is often submitted many times.
+    The resolved document is kept in memory, for the last ``memory_entries``
+    documents, and in ``directory``, shared by all workers. It is keyed by
+    the document, the validation options and the versions of cwltool and
+    schema-salad.
+
+    Resolved documents refer to the workspace they were loaded from; the
+    directory of the document is replaced by a placeholder in cached
+    documents, and by the directory of the new document on a hit. Documents
+    pulling in other files (``$import``, ``$include``, ...) or job orders
+    are not cached, since their key would not cover these files.
+    """
+
+    def __init__(self, directory, memory_entries=32):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.versions = [_version('cwltool'), _version('schema-salad')]
+
+    def key(self, text, options):
+        """Compute the cache key of a document.
+
+        :param text: JSON of the document, with its directory replaced by
+            :data:`BASE_PLACEHOLDER`.
+        :param options: Validation options.
+        """
+        description = json.dumps([self.versions, options, text],
+                                 sort_keys=True)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, key):
+        """Return the cached document for ``key``, or ``None``."""
+        with self.lock:
+            text = self.memory.pop(key, None)
+            if text is not None:
+                self.memory[key] = text
+                return text
+        try:
+            with open(self._entry(key), 'rb') as f:
+                text = f.read().decode('utf-8')
+        except (IOError, OSError):
+            return None
+        self._remember(key, text)
+        return text
+
+    def store(self, key, text):
+        """Add ``text`` as the cached document for ``key``."""
+        self._remember(key, text)
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmp_path = tempfile.mkstemp(prefix='.' + key,
+                                            dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(text.encode('utf-8'))
+            os.rename(tmp_path, entry)
+        except (IOError, OSError) as e:
+            log.warning('could not add document cache entry %s: %s', key, e)
+
+    def _remember(self, key, text):
+        with self.lock:
+            self.memory[key] = text
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def wrap(self, validate_document):
+        """Return ``validate_document`` answering from the cache."""
+        @functools.wraps(validate_document)
+        def cached_validate_document(document_loader, workflowobj, uri,
+                                     **kwargs):
+            options = [kwargs.get('enable_dev', False),
+                       kwargs.get('strict', True),
+                       kwargs.get('skip_schemas')]
+            text = json.dumps(workflowobj, sort_keys=True)
+            cacheable = isinstance(workflowobj, dict) and \
+                'cwl:tool' not in workflowobj and \
+                workflowobj.get('cwlVersion') != 'draft-2' and \
+                not EXTERNAL_REFERENCE_RE.search(text) and \
+                not any(kwargs.get(option) for option in
+                        ('preprocess_only', 'overrides', 'metadata'))
+            if not cacheable:
+                return validate_document(document_loader, workflowobj, uri,
+                                         **kwargs)
+            fileuri = uri.split('#')[0]
+            base = fileuri.rsplit('/', 1)[0] + '/'
+            key = self.key(text.replace(base, BASE_PLACEHOLDER), options)
+
+            cached = self.load(key)
+            if cached is not None:
+                DOCUMENT_CACHE_HITS.inc()
+                document = json.loads(cached.replace(BASE_PLACEHOLDER, base))
+                return self.restore(document_loader, document, fileuri,
+                                    kwargs) + (uri,)
+
+            DOCUMENT_CACHE_MISSES.inc()
+            result = validate_document(document_loader, workflowobj, uri,
+                                       **kwargs)
+            try:
+                # the version the document was validated against
+                document = json.dumps({'cwlVersion': workflowobj['cwlVersion'],
+                                       'processobj': result[2],
+                                       'metadata': result[3]},
+                                      sort_keys=True)
+            except (TypeError, ValueError) as e:
+                log.warning('document %s cannot be cached: %s', uri, e)
+            else:
+                self.store(key, document.replace(base, BASE_PLACEHOLDER))
+            return result
+
+        return cached_validate_document
+
+    def restore(self, document_loader, document, fileuri, kwargs):
+        """Rebuild what ``validate_document`` returns from a cached document.
+
+        :returns: The document loader, schema names, process object and
+            metadata.
+        """
+        metadata = cmap(document['metadata'], fn=fileuri)
+        processobj = cmap(document['processobj'], fn=fileuri)
+        schema_loader, avsc_names = get_schema(document['cwlVersion'])[:2]
+        loader = Loader(schema_loader.ctx, schemagraph=schema_loader.graph,
+                        idx=document_loader.idx, cache=schema_loader.cache,
+                        fetcher_constructor=kwargs.get('fetcher_constructor'),
+                        skip_schemas=kwargs.get('skip_schemas'))
+        if isinstance(processobj, list):
+            loader.idx[fileuri] = cmap({'$graph': processobj}, fn=fileuri)
+        else:
+            loader.idx[fileuri] = processobj
+        _register_ids(loader, processobj)
+        return loader, avsc_names, processobj, metadata
+
+
+@contextmanager
+def cached_validation(module, cache):
+    """Make ``module.validate_document`` use ``cache`` within the block.
+
+    :param cache: :class:`DocumentCache`, or ``None`` not to cache.
+    """
+    validate_document = module.validate_document
+    if cache is not None:
+        module.validate_document = cache.wrap(validate_document)
+    try:
+        yield
+    finally:
+        module.validate_document = validate_document
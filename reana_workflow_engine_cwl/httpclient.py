@@ -22,16 +22,106 @@
 
 import json
 import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from reana_workflow_engine_cwl.config import JOBCONTROLLER_HOST
+from reana_workflow_engine_cwl import metrics
+from reana_workflow_engine_cwl.config import (JOBCONTROLLER_CONNECT_TIMEOUT,
+                                              JOBCONTROLLER_HOST,
+                                              JOBCONTROLLER_MAX_RETRIES,
+                                              JOBCONTROLLER_POOL_SIZE,
+                                              JOBCONTROLLER_READ_TIMEOUT)
 
 log = logging.getLogger('yadage.cap.submit')
 
+REQUEST_SECONDS = metrics.histogram(
+    'cwl_engine_jobcontroller_request_seconds',
+    'Time taken by requests to the job controller.', ['operation'])
+REQUEST_ERRORS = metrics.counter(
+    'cwl_engine_jobcontroller_request_errors_total',
+    'Requests to the job controller which failed or returned an error.',
+    ['operation'])
+
+
+def request_operation(method, url):
+    """Name the job controller operation requested by ``method url``."""
+    path = urlparse(url).path.rstrip('/')
+    if method.upper() == 'POST':
+        if path.endswith('/status'):
+            return 'status_batch'
+        return 'submit_batch' if path.endswith('/batch') else 'submit'
+    if path.endswith('/logs'):
+        return 'logs'
+    return 'status'
+
+
+class InstrumentedSession(requests.Session):
+    """Session recording the latency and the errors of its requests."""
+
+    def request(self, method, url, *args, **kwargs):
+        operation = request_operation(method, url)
+        started = time.time()
+        try:
+            response = super(InstrumentedSession, self).request(
+                method, url, *args, **kwargs)
+        except Exception:
+            REQUEST_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            REQUEST_SECONDS.observe(time.time() - started,
+                                    operation=operation)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.inc(operation=operation)
+        return response
+
 
 class ReanaJobControllerHTTPClient:
 
+    def __init__(self, host=JOBCONTROLLER_HOST, workers=10,
+                 pool_size=JOBCONTROLLER_POOL_SIZE,
+                 connect_timeout=JOBCONTROLLER_CONNECT_TIMEOUT,
+                 read_timeout=JOBCONTROLLER_READ_TIMEOUT,
+                 max_retries=JOBCONTROLLER_MAX_RETRIES):
+        self.host = host
+        self.workers = workers
+        self.bulk_status_supported = True
+        self.bulk_submit_supported = True
+        self._pool = None
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self._create_session(pool_size, max_retries)
+
+    @staticmethod
+    def _create_session(pool_size, max_retries):
+        """Create a session keeping connections to the job controller alive.
+
+        The connection pool is shared by all threads using the client and
+        blocks once ``pool_size`` connections are in use. Connection errors
+        and 502/503/504 answers are retried with exponential backoff; POST
+        requests are only retried if they could not be sent at all, so that
+        a job is never submitted twice.
+        """
+        retries = Retry(total=max_retries,
+                        backoff_factor=0.2,
+                        status_forcelist=(502, 503, 504),
+                        raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=pool_size,
+                              pool_block=True,
+                              max_retries=retries)
+        session = InstrumentedSession()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def submit(self, experiment, image, cmd):
         job_spec = {
             'experiment': experiment,
@@ -43,39 +133,183 @@ class ReanaJobControllerHTTPClient:
 
         log.info('submitting %s', json.dumps(job_spec, indent=4, sort_keys=True))
 
-        response = requests.post(
+        response = self.session.post(
             'http://{host}/{resource}'.format(
-                host=JOBCONTROLLER_HOST,
+                host=self.host,
                 resource='jobs'
             ),
             json=job_spec,
-            headers={'content-type': 'application/json'}
+            headers={'content-type': 'application/json'},
+            timeout=self.timeout
         )
 
         job_id = str(response.json()['job_id'])
         return job_id
 
+    def submit_many(self, tasks):
+        """Submit many jobs at once.
+
+        The jobs are sent to the job controller's batch endpoint in a single
+        request. If the controller does not provide it, they are submitted
+        one by one in parallel instead. Other errors are raised: the
+        controller may have created some of the jobs already, which must
+        not be submitted twice.
+
+        :param tasks: List of dictionaries with the arguments of
+            :meth:`submit`.
+        :returns: List with the job id of each task, in the same order, or
+            ``None`` for tasks which could not be submitted.
+        """
+        tasks = list(tasks)
+        if self.bulk_submit_supported and len(tasks) > 1:
+            job_ids = self._submit_batch(tasks)
+            if job_ids is not None:
+                return job_ids
+        return self._map(self._submit_or_none, tasks)
+
+    def _submit_batch(self, tasks):
+        """Submit ``tasks`` in one request to the batch endpoint.
+
+        Returns ``None``, and stops trying from then on, if the job
+        controller does not support batch submission.
+        """
+        job_specs = [{
+            'experiment': task['experiment'],
+            'docker_img': task['image'],
+            'cmd': task['cmd'],
+            'max_restart_count': 0,
+            'env_vars': {}
+        } for task in tasks]
+
+        log.info('submitting %d jobs', len(job_specs))
+
+        response = self.session.post(
+            'http://{host}/{resource}'.format(
+                host=self.host,
+                resource='jobs/batch'
+            ),
+            json={'jobs': job_specs},
+            headers={'content-type': 'application/json'},
+            timeout=self.timeout
+        )
+        if response.status_code in (404, 405, 501):
+            log.info('job controller cannot submit batches of jobs, '
+                     'submitting them one by one')
+            self.bulk_submit_supported = False
+            return None
+        response.raise_for_status()
+        return [str(job_id) if job_id is not None else None
+                for job_id in response.json()['job_ids']]
+
+    def _submit_or_none(self, task):
+        try:
+            return self.submit(**task)
+        except Exception as e:
+            log.error('submitting job failed: %s', e)
+            return None
+
     def check_status(self, job_id):
-        response = requests.get(
+        response = self.session.get(
             'http://{host}/{resource}/{id}'.format(
-                host=JOBCONTROLLER_HOST,
+                host=self.host,
                 resource='jobs',
                 id=job_id
             ),
-            headers={'cache-control': 'no-cache'}
+            headers={'cache-control': 'no-cache'},
+            timeout=self.timeout
         )
 
         job_info = response.json()['job']
         return job_info
 
+    def check_status_many(self, job_ids):
+        """Check the status of many jobs at once.
+
+        The status of all jobs is asked for in a single request to the job
+        controller's batch status endpoint. Jobs it does not answer for, or
+        all jobs if the controller does not provide the endpoint, are
+        checked one by one in parallel instead. Jobs whose status could not
+        be retrieved are left out of the result.
+
+        :param job_ids: Identifiers of the jobs to check.
+        :returns: Dictionary mapping job ids to job information.
+        """
+        job_ids = list(job_ids)
+        statuses = {}
+        if self.bulk_status_supported and job_ids:
+            try:
+                jobs = self._check_status_batch(job_ids)
+            except Exception as e:
+                log.error('checking status of jobs failed: %s', e)
+                jobs = None
+            if jobs is not None:
+                statuses = dict((job_id, jobs[job_id])
+                                for job_id in job_ids if job_id in jobs)
+
+        missing = [job_id for job_id in job_ids if job_id not in statuses]
+        results = self._map(self._check_status_or_none, missing)
+        statuses.update((job_id, job_info)
+                        for job_id, job_info in zip(missing, results)
+                        if job_info is not None)
+        return statuses
+
+    def _check_status_batch(self, job_ids):
+        """Fetch the status of ``job_ids`` in one request.
+
+        Returns ``None``, and stops trying from then on, if the job
+        controller does not support checking the status of many jobs.
+        """
+        response = self.session.post(
+            'http://{host}/{resource}'.format(
+                host=self.host,
+                resource='jobs/status'
+            ),
+            json={'job_ids': job_ids},
+            headers={'content-type': 'application/json',
+                     'cache-control': 'no-cache'},
+            timeout=self.timeout
+        )
+        if response.status_code in (404, 405, 501):
+            log.info('job controller cannot check the status of many jobs, '
+                     'checking job status one by one')
+            self.bulk_status_supported = False
+            return None
+        response.raise_for_status()
+        return dict((str(job_id), job_info) for job_id, job_info
+                    in response.json()['jobs'].items())
+
+    def _check_status_or_none(self, job_id):
+        try:
+            return self.check_status(job_id)
+        except Exception as e:
+            log.error('checking status of job %s failed: %s', job_id, e)
+            return None
+
+    def _map(self, function, items):
+        """Apply ``function`` to ``items`` in parallel threads."""
+        if not items:
+            return []
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        return self._pool.map(function, items)
+
+    def close(self):
+        """Stop the threads of the client and close its connections."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self.session.close()
+
     def get_logs(self, job_id):
-        response = requests.get(
+        response = self.session.get(
             'http://{host}/{resource}/{id}/logs'.format(
-                host=JOBCONTROLLER_HOST,
+                host=self.host,
                 resource='jobs',
                 id=job_id
             ),
-            headers={'cache-control': 'no-cache'}
+            headers={'cache-control': 'no-cache'},
+            timeout=self.timeout
         )
 
         return response.text
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Logging through a background writer thread."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import copy
+import logging
+import threading
+
+try:
+    from queue import Empty, Full, Queue
+except ImportError:
+    from Queue import Empty, Full, Queue
+
+from reana_workflow_engine_cwl.config import LOG_QUEUE_POLICY, LOG_QUEUE_SIZE
+
+POLICIES = ('block', 'drop')
+
+
+class QueueLogHandler(logging.Handler):
+    """Logging handler passing records to ``target`` on a writer thread.
+
+    Threads logging only put the record in a bounded queue, so that a slow
+    ``target`` never holds them up until the queue is full. Then, with the
+    ``block`` policy they wait for room in the queue, and with the ``drop``
+    policy the record is dropped, unless it is an error.
+
+    ``target`` is flushed whenever the queue has been empty for
+    ``idle_interval`` seconds, and closed with the handler. It is only ever
+    used from the writer thread, since it may hold resources bound to the
+    thread using them, such as SQLite connections.
+    """
+
+    def __init__(self, target, maxsize=LOG_QUEUE_SIZE,
+                 policy=LOG_QUEUE_POLICY, idle_interval=1):
+        logging.Handler.__init__(self)
+        if policy not in POLICIES:
+            raise ValueError('unknown log queue policy ' + policy)
+        self.target = target
+        self.policy = policy
+        self.idle_interval = idle_interval
+        self.queue = Queue(maxsize)
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.writer = threading.Thread(target=self.run,
+                                       name='reana-log-writer')
+        self.writer.daemon = True
+        self.writer.start()
+
+    def prepare(self, record):
+        """Return a copy of ``record`` which can be handled later.
+
+        The message is formatted now, so that objects passed as arguments
+        may change in the meantime.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            record = self.prepare(record)
+            if self.policy == 'drop' and record.levelno < logging.ERROR:
+                self.queue.put_nowait(record)
+            else:
+                self.queue.put(record)
+            self.queued += 1
+        except Full:
+            self.dropped += 1
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.idle_interval)
+            except Empty:
+                try:
+                    self.target.flush()
+                except Exception:
+                    # what could not be written is tried again later
+                    pass
+                continue
+            if record is None:
+                break
+            self.target.handle(record)
+            self.written += 1
+        self.target.close()
+
+    def close(self):
+        """Write the queued records, then close ``target``.
+
+        Both happen on the writer thread, which is waited for.
+        """
+        try:
+            if self.writer.is_alive():
+                self.queue.put(None)
+                self.writer.join()
+        finally:
+            logging.Handler.close(self)
+
+    def __str__(self):
+        return '{0} log records queued, {1} written, {2} dropped'.format(
+            self.queued, self.written, self.dropped)
@@ -8,19 +8,34 @@ from io import BytesIO
 
 import cwltool.main
 import pkg_resources
-import shutil
 
 from reana_workflow_engine_cwl.__init__ import __version__
-from reana_workflow_engine_cwl.config import SHARED_VOLUME
+from reana_workflow_engine_cwl.config import (DOCUMENT_CACHE_DIRECTORY,
+                                              DOCUMENT_CACHE_ENABLED,
+                                              DOCUMENT_CACHE_MEMORY_ENTRIES,
+                                              EXECUTION_MODE, SHARED_VOLUME,
+                                              STAGING_STRATEGIES)
 from reana_workflow_engine_cwl.cwl_reana import ReanaPipeline
 from reana_workflow_engine_cwl.database import SQLiteHandler
-from reana_workflow_engine_cwl.models import Workflow
+from reana_workflow_engine_cwl.documentcache import (DocumentCache,
+                                                     cached_validation)
+from reana_workflow_engine_cwl.logqueue import QueueLogHandler
+from reana_workflow_engine_cwl.models import JobTiming, Workflow
+from reana_workflow_engine_cwl.profiling import (PROFILE_DIR_NAME,
+                                                 PhaseTimer, WorkflowProfile,
+                                                 timed_calls)
+from reana_workflow_engine_cwl.staging import sync_directory
 
 log = logging.getLogger("reana-workflow-engine-cwl")
 log.setLevel(logging.INFO)
 console = logging.StreamHandler()
 log.addHandler(console)
 
+# kept for the lifetime of the worker process
+document_cache = DocumentCache(
+    DOCUMENT_CACHE_DIRECTORY,
+    DOCUMENT_CACHE_MEMORY_ENTRIES) if DOCUMENT_CACHE_ENABLED else None
+
 
 def versionstring():
     pkg = pkg_resources.require("cwltool")
@@ -36,13 +51,35 @@ def main(db_session, workflow_uuid, workflow_spec, workflow_inputs, working_dir,
     first_arg = working_dir.split("/")[0]
     if first_arg in ORGANIZATIONS:
         working_dir = working_dir.replace(first_arg, SHARED_VOLUME)
+    phases = PhaseTimer()
+    if not kwargs.get("profile"):
+        return run_workflow(db_session, workflow_uuid, workflow_spec,
+                            workflow_inputs, working_dir, phases, **kwargs)
+    profile = WorkflowProfile(phases)
+    try:
+        with profile:
+            return run_workflow(db_session, workflow_uuid, workflow_spec,
+                                workflow_inputs, working_dir, phases,
+                                **kwargs)
+    finally:
+        try:
+            profile.write(os.path.join(os.path.dirname(working_dir),
+                                       PROFILE_DIR_NAME))
+        except (IOError, OSError) as e:
+            log.warning("could not write the profile: {0}".format(e))
+
+
+def run_workflow(db_session, workflow_uuid, workflow_spec, workflow_inputs,
+                 working_dir, phases, **kwargs):
     src = os.path.join(os.path.dirname(working_dir), "code")
     inputs_dir = os.path.join(os.path.dirname(working_dir), "inputs")
-    src_files = os.listdir(src)
-    for file_name in src_files:
-        full_file_name = os.path.join(src, file_name)
-        if os.path.isfile(full_file_name):
-            shutil.copy(full_file_name, inputs_dir)
+    with phases.phase("staging"):
+        # the manifest is kept out of the inputs users see
+        sync_metrics = sync_directory(
+            src, inputs_dir,
+            os.path.join(working_dir, "code-sync-manifest.json"),
+            STAGING_STRATEGIES)
+    log.info("code synced: {0}".format(sync_metrics))
     os.chdir(inputs_dir)
     log.error("dumping files...")
     with open("workflow.json", "w") as f:
@@ -78,18 +115,38 @@ def main(db_session, workflow_uuid, workflow_spec, workflow_inputs, working_dir,
     if parsed_args.debug:
         log.setLevel(logging.DEBUG)
 
-    pipeline = ReanaPipeline(working_dir, vars(parsed_args))
+    if kwargs.get("execution_mode", EXECUTION_MODE) == "asyncio":
+        from reana_workflow_engine_cwl.cwl_reana_asyncio import \
+            AsyncReanaPipeline
+        pipeline = AsyncReanaPipeline(working_dir, vars(parsed_args))
+    else:
+        pipeline = ReanaPipeline(working_dir, vars(parsed_args))
+    pipeline.phases = phases
     log.error("starting the run..")
-    db_log_writer = SQLiteHandler(db_session, workflow_uuid)
+    db_log_writer = QueueLogHandler(SQLiteHandler(db_session, workflow_uuid))
 
     f = BytesIO()
-    result = cwltool.main.main(
-        args=parsed_args,
-        executor=pipeline.executor,
-        makeTool=pipeline.make_tool,
-        versionfunc=versionstring,
-        logger_handler=db_log_writer,
-        stdout=f
-    )
-    Workflow.append_workflow_logs(db_session, workflow_uuid, f.getvalue().decode("utf-8"))
+    try:
+        with cached_validation(cwltool.main, document_cache), \
+                timed_calls(cwltool.main, "fetch_document", phases,
+                            "loading"), \
+                timed_calls(cwltool.main, "validate_document", phases,
+                            "validation"):
+            result = cwltool.main.main(
+                args=parsed_args,
+                executor=pipeline.executor,
+                makeTool=pipeline.make_tool,
+                versionfunc=versionstring,
+                logger_handler=db_log_writer,
+                stdout=f
+            )
+    finally:
+        log.info("workflow phases: {0}".format(phases))
+        db_log_writer.close()
+        log.info(str(db_log_writer))
+        JobTiming.add_job_timings(db_session, workflow_uuid,
+                                  pipeline.job_timings)
+        # log records are in WorkflowLog, only cwltool's output is added
+        Workflow.append_workflow_logs(db_session, workflow_uuid,
+                                      f.getvalue().decode("utf-8"))
     return result
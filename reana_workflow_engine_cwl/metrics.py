@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""In-process metrics of the engine, in the Prometheus text format.
+
+Metrics are created once, at import time of the module using them, with
+:func:`counter`, :func:`gauge` and :func:`histogram`. Each process exposes
+its metrics on an HTTP endpoint and/or writes them to a file for the node
+exporter's textfile collector (``METRICS_TEXTFILE``, in which ``{pid}`` is
+replaced by the process id so that Celery worker processes do not overwrite
+each other's file). Worker processes of a Celery pool cannot share a port:
+the process with pool index ``i`` listens on ``METRICS_PORT + i``.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import os
+import socket
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from reana_workflow_engine_cwl.config import (METRICS_PORT, METRICS_TEXTFILE,
+                                              METRICS_TEXTFILE_INTERVAL)
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60, 300, 900, 3600)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', r'\\')
+                           .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs) + '}'
+
+
+class Metric(object):
+    """Metric with a value for each combination of its labels."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.values[()] = self.initial_value()
+
+    def initial_value(self):
+        return 0
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{0} takes the labels {1}'.format(
+                self.name, ', '.join(self.labelnames)))
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """Yield the name, label values and value of each sample."""
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield self.name, key, (), value
+
+    def expose(self):
+        lines = ['# HELP {0} {1}'.format(self.name, self.documentation),
+                 '# TYPE {0} {1}'.format(self.name, self.type)]
+        for name, key, extra, value in self.samples():
+            lines.append('{0}{1} {2}'.format(
+                name, _format_labels(self.labelnames, key, extra),
+                _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter(Metric):
+    """Value which only goes up."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """Value which goes up and down."""
+
+    type = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, counted in buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super(Histogram, self).__init__(name, documentation, labelnames)
+
+    def initial_value(self):
+        return [0] * len(self.buckets), 0
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total = self.values.get(key) or self.initial_value()
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Return a context manager observing how long its body runs."""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        counts, _ = self.values.get(self._key(labels), ([0], 0))
+        return sum(counts)
+
+    def samples(self):
+        with self.lock:
+            values = sorted((key, (list(counts), total))
+                            for key, (counts, total) in self.values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (self.name + '_bucket', key,
+                       (('le', _format_value(bound)),), cumulative)
+            yield self.name + '_sum', key, (), total
+            yield self.name + '_count', key, (), cumulative
+
+
+class _Timer(object):
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.time() - self.started, **self.labels)
+
+
+class Registry(object):
+    """Set of the metrics of a process, by name."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Add ``metric``, or return the metric registered under its name."""
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError('metric {0} already registered as a '
+                                     '{1}'.format(metric.name, existing.type))
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def expose(self):
+        """Return all metrics in the Prometheus text format."""
+        with self.lock:
+            metrics = sorted(self.metrics.items())
+        return ''.join(metric.expose() for _, metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames,
+                                       buckets))
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Write the metrics to ``path`` atomically."""
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(registry.expose().encode('utf-8'))
+    os.rename(tmp_path, path)
+
+
+class TextfileExporter(threading.Thread):
+    """Write the metrics to a file every ``interval`` seconds."""
+
+    def __init__(self, path, interval, registry=REGISTRY):
+        super(TextfileExporter, self).__init__(name='reana-metrics-textfile')
+        self.daemon = True
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while True:
+            try:
+                write_textfile(self.path, self.registry)
+            except (IOError, OSError) as e:
+                log.warning('could not write metrics to %s: %s',
+                            self.path, e)
+            if self.stopped.wait(self.interval):
+                break
+
+
+def start_http_server(port, address='', registry=REGISTRY):
+    """Serve the metrics over HTTP from a background thread.
+
+    :returns: The HTTP server, whose ``server_port`` is the port listened
+        on.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            body = registry.expose().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer((address, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='reana-metrics-http')
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+_exporters_started = False
+
+
+def _pool_index():
+    """Return the index of this process in its Celery pool, 0 outside one."""
+    try:
+        from billiard.process import current_process
+    except ImportError:
+        return 0
+    return getattr(current_process(), 'index', None) or 0
+
+
+def start_exporters(index=None, **kwargs):
+    """Start the configured exporters of this process, once.
+
+    :param index: Index of the process in its pool, which offsets the port
+        of the HTTP endpoint; found from billiard by default.
+    """
+    global _exporters_started
+    if _exporters_started:
+        return
+    _exporters_started = True
+    if METRICS_PORT is not None:
+        port = METRICS_PORT + (_pool_index() if index is None else index)
+        try:
+            start_http_server(port)
+        except socket.error as e:
+            log.warning('cannot serve metrics on port %s: %s', port, e)
+    if METRICS_TEXTFILE:
+        TextfileExporter(METRICS_TEXTFILE.format(pid=os.getpid()),
+                         METRICS_TEXTFILE_INTERVAL).start()
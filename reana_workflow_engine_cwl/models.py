@@ -26,9 +26,10 @@ from __future__ import absolute_import
 
 import enum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, String
+from sqlalchemy import (BigInteger, Column, DateTime, Enum, Float, ForeignKey,
+                        Integer, String)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from sqlalchemy_utils import JSONType, UUIDType
 
@@ -69,15 +70,30 @@ class Workflow(Base):
     workspace_path = Column(String(255))
     status = Column(Enum(WorkflowStatus), default=WorkflowStatus.created)
     owner_id = Column(UUIDType, ForeignKey('user.id_'))
-    specification = Column(JSONType)
-    parameters = Column(JSONType)
+    # large columns are only loaded when accessed
+    specification = deferred(Column(JSONType))
+    parameters = deferred(Column(JSONType))
     type_ = Column(String(30))
-    logs = Column(String)
+    logs = deferred(Column(String))
 
     def __repr__(self):
         """Workflow string represetantion."""
         return '<Workflow %r>' % self.id_
 
+    @staticmethod
+    def _update(db_session, workflow_uuid, values):
+        """Set columns of a workflow with a single UPDATE statement.
+
+        The workflow row is not loaded, so its large columns are never read.
+        """
+        updated = db_session.query(Workflow).filter_by(
+            id_=workflow_uuid).update(values, synchronize_session=False)
+        if not updated:
+            db_session.rollback()
+            raise Exception('Workflow {0} doesn\'t exist in database.'.format(
+                workflow_uuid))
+        db_session.commit()
+
     @staticmethod
     def update_workflow_status(db_session, workflow_uuid, status, log, message=None):
         """Update database workflow status.
@@ -88,15 +104,7 @@ class Workflow(Base):
            status, if there is any.
         """
         try:
-            workflow = \
-                db_session.query(Workflow).filter_by(id_=workflow_uuid).first()
-
-            if not workflow:
-                raise Exception('Workflow {0} doesn\'t exist in database.'.format(
-                    workflow_uuid))
-
-            workflow.status = status
-            db_session.commit()
+            Workflow._update(db_session, workflow_uuid, {'status': status})
         except Exception as e:
             log.info(
                 'An error occurred while updating workflow: {0}'.format(str(e)))
@@ -112,16 +120,134 @@ class Workflow(Base):
            status, if there is any.
         """
         try:
-            workflow = \
-                db_session.query(Workflow).filter_by(id_=workflow_uuid).first()
-
-            if not workflow:
-                raise Exception('Workflow {0} doesn\'t exist in database.'.format(
-                    workflow_uuid))
-
-            workflow.logs = (workflow.logs or "") + new_logs
-            db_session.commit()
+            Workflow._update(
+                db_session, workflow_uuid,
+                {'logs': func.coalesce(Workflow.logs, '') + new_logs})
         except Exception as e:
             # log.info(
             #     'An error occurred while updating workflow: {0}'.format(str(e)))
-            raise e
\ No newline at end of file
+            raise e
+
+
+class WorkflowLog(Base):
+    """Workflow log table.
+
+    Each row holds one log line of a workflow. Lines are only ever
+    inserted, numbered in order per workflow, so that writing a line costs
+    the same however long the logs already are.
+    """
+
+    __tablename__ = 'workflow_log'
+
+    workflow_uuid = Column(UUIDType, ForeignKey('workflow.id_'),
+                           primary_key=True)
+    sequence = Column(Integer, primary_key=True, autoincrement=False)
+    created = Column(DateTime)
+    level = Column(String(10))
+    job_name = Column(String(255))
+    text = Column(String)
+
+    def __repr__(self):
+        """Workflow log string represetantion."""
+        return '<WorkflowLog %r %r>' % (self.workflow_uuid, self.sequence)
+
+    @staticmethod
+    def next_sequence(db_session, workflow_uuid):
+        """Return the sequence number of the next log line of a workflow."""
+        last = db_session.query(func.max(WorkflowLog.sequence)).filter(
+            WorkflowLog.workflow_uuid == workflow_uuid).scalar()
+        return 0 if last is None else last + 1
+
+    @staticmethod
+    def append_workflow_logs(db_session, workflow_uuid, lines):
+        """Insert log lines of a workflow with a single statement.
+
+        :param workflow_uuid: UUID which represents the workflow.
+        :param lines: List of dictionaries with the ``sequence``,
+            ``created``, ``level``, ``job_name`` and ``text`` of each line.
+        """
+        if not lines:
+            return
+        db_session.execute(
+            WorkflowLog.__table__.insert(),
+            [dict(line, workflow_uuid=workflow_uuid) for line in lines])
+        db_session.commit()
+
+    @staticmethod
+    def get_workflow_logs(db_session, workflow_uuid, after=None, limit=None,
+                          job_name=None):
+        """Return log lines of a workflow, in order.
+
+        :param workflow_uuid: UUID which represents the workflow.
+        :param after: Only return the lines after this sequence number.
+        :param limit: Maximum number of lines to return.
+        :param job_name: Only return the lines of this job.
+        """
+        query = db_session.query(WorkflowLog).filter(
+            WorkflowLog.workflow_uuid == workflow_uuid)
+        if after is not None:
+            query = query.filter(WorkflowLog.sequence > after)
+        if job_name is not None:
+            query = query.filter(WorkflowLog.job_name == job_name)
+        query = query.order_by(WorkflowLog.sequence)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @staticmethod
+    def read_workflow_logs(db_session, workflow_uuid, page_size=10000):
+        """Reconstruct the logs of a workflow as a single string."""
+        chunks = []
+        after = None
+        while True:
+            lines = WorkflowLog.get_workflow_logs(
+                db_session, workflow_uuid, after=after, limit=page_size)
+            chunks.extend(u"%s\n" % line.text for line in lines)
+            if len(lines) < page_size:
+                return u"".join(chunks)
+            after = lines[-1].sequence
+
+
+class JobTiming(Base):
+    """Job timing table.
+
+    Each row tells where the time of one job of a workflow went: when it
+    became ready, was submitted to the job controller, started and
+    finished, and how long staging its inputs and collecting its outputs
+    took.
+    """
+
+    __tablename__ = 'job_timing'
+
+    id_ = Column(Integer, primary_key=True)
+    workflow_uuid = Column(UUIDType, ForeignKey('workflow.id_'), index=True)
+    step_name = Column(String(255))
+    job_id = Column(String(255))
+    image = Column(String(255))
+    queued = Column(DateTime)
+    submitted = Column(DateTime)
+    started = Column(DateTime)
+    finished = Column(DateTime)
+    staging_time = Column(Float)
+    collection_time = Column(Float)
+    bytes_staged = Column(BigInteger)
+    poll_count = Column(Integer)
+    status = Column(String(30))
+
+    def __repr__(self):
+        """Job timing string represetantion."""
+        return '<JobTiming %r %r>' % (self.workflow_uuid, self.step_name)
+
+    @staticmethod
+    def add_job_timings(db_session, workflow_uuid, timings):
+        """Insert the timings of jobs of a workflow with a single statement.
+
+        :param workflow_uuid: UUID which represents the workflow.
+        :param timings: List of dictionaries with the columns of each job.
+        """
+        if not timings:
+            return
+        db_session.execute(
+            JobTiming.__table__.insert(),
+            [dict(timing, workflow_uuid=workflow_uuid) for timing in timings])
+        db_session.commit()
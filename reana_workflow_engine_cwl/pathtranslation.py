@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Translation of the paths cwltool gives a job to the paths REANA uses."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import re
+
+DELIMITERS = '\\s"\'`=:,;()<>|&'
+"""Characters which end a path in an argument."""
+
+PATH_RE = re.compile('(?:^|(?<=[{0}]))/[^{0}]*'.format(DELIMITERS))
+"""Absolute path in an argument, starting at its beginning or a delimiter."""
+
+
+class _Node(object):
+
+    __slots__ = ('children', 'replacement')
+
+    def __init__(self):
+        self.children = {}
+        self.replacement = None
+
+
+class PathTranslator(object):
+    """Table of path prefixes and what they are replaced with.
+
+    Prefixes are stored as a tree of path components, so that translating
+    a path only walks down its components once, whatever the size of the
+    table, and only ever matches whole components: ``/out`` is translated
+    in ``/out/a.txt`` but not in ``/outputs``. The longest matching prefix
+    wins.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, prefix, replacement):
+        """Translate paths under ``prefix`` to paths under ``replacement``."""
+        prefix = prefix.rstrip('/')
+        replacement = replacement.rstrip('/') or '/'
+        if not prefix.startswith('/') or prefix == replacement:
+            return
+        node = self.root
+        for component in prefix.split('/')[1:]:
+            child = node.children.get(component)
+            if child is None:
+                child = node.children[component] = _Node()
+            node = child
+        node.replacement = replacement
+
+    def translate_path(self, path):
+        """Return the translation of the absolute path ``path``."""
+        node = self.root
+        match = None
+        position = 0
+        length = len(path)
+        while position < length and path[position] == '/':
+            end = path.find('/', position + 1)
+            if end == -1:
+                end = length
+            node = node.children.get(path[position + 1:end])
+            if node is None:
+                break
+            position = end
+            if node.replacement is not None:
+                match = (position, node.replacement)
+        if match is None:
+            return path
+        position, replacement = match
+        if replacement == '/' and position < length:
+            return path[position:]
+        return replacement + path[position:]
+
+    def translate(self, text):
+        """Translate every absolute path in ``text``, such as an argument."""
+        if '/' not in text:
+            return text
+        return PATH_RE.sub(lambda m: self.translate_path(m.group(0)), text)
@@ -2,23 +2,45 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import logging
 import os
+import shutil
 import tempfile
-import time
+import threading
+from collections import Counter
+from multiprocessing.pool import ThreadPool
 
 # from builtins import str
 from cwltool.errors import WorkflowException
 from cwltool.job import JobBase
-from cwltool.process import cleanIntermediate, relocateOutputs
+from cwltool.pathmapper import PathMapper, visit_class
+from cwltool.process import (collectFilesAndDirs, empty_subtree,
+                             relocateOutputs)
 from cwltool.mutation import MutationManager
+from schema_salad.ref_resolver import file_uri, uri_file_path
 import traceback
 
+from reana_workflow_engine_cwl import metrics
+from reana_workflow_engine_cwl.config import RELOCATION_WORKERS
+from reana_workflow_engine_cwl.profiling import PhaseTimer
+from reana_workflow_engine_cwl.staging import move_path
+
 log = logging.getLogger("tes-backend")
 
+JOBS_IN_FLIGHT = metrics.gauge(
+    'cwl_engine_jobs_in_flight', 'Jobs started and not finished yet.')
+PIPELINE_THREADS = metrics.gauge(
+    'cwl_engine_pipeline_threads',
+    'Threads started by pipelines, such as status poll threads.')
+
 
 class Pipeline(object):
 
     def __init__(self):
         self.threads = []
+        self.pending_jobs = 0
+        self.jobs_changed = False
+        self.jobs_condition = threading.Condition()
+        self.relocation_workers = RELOCATION_WORKERS
+        self.phases = PhaseTimer()
 
     def executor(self, tool, job_order, **kwargs):
         final_output = []
@@ -70,21 +92,8 @@ class Pipeline(object):
 
         jobs = tool.job(job_order, output_callback, **kwargs)
         try:
-            for runnable in jobs:
-                if runnable:
-                    builder = kwargs.get("builder", None)
-                    if builder is not None:
-                        runnable.builder = builder
-                    if runnable.outdir:
-                        output_dirs.add(runnable.outdir)
-                    runnable.run(**kwargs)
-                else:
-                    # log.error(
-                    #     "Workflow cannot make any more progress"
-                    # )
-                    # break
-                    time.sleep(1)
-
+            with self.phases.phase("dispatch"):
+                self.dispatch_jobs(jobs, output_dirs, kwargs)
         except WorkflowException as e:
             traceback.print_exc()
             raise e
@@ -93,37 +102,184 @@ class Pipeline(object):
             raise WorkflowException(str(e))
 
         # wait for all processes to finish
-        self.wait()
+        with self.phases.phase("waiting"):
+            self.wait()
 
-        if final_output and final_output[0] and finaloutdir:
-            final_output[0] = relocateOutputs(
-                final_output[0], finaloutdir,
-                output_dirs, kwargs.get("move_outputs"),
-                kwargs["make_fs_access"](""))
+        with self.phases.phase("relocation"):
+            if final_output and final_output[0] and finaloutdir:
+                final_output[0] = self.relocate_outputs(
+                    final_output[0], finaloutdir,
+                    output_dirs, kwargs.get("move_outputs"),
+                    kwargs["make_fs_access"](""))
 
-        if kwargs.get("rm_tmpdir"):
-            cleanIntermediate(output_dirs)
+            if kwargs.get("rm_tmpdir"):
+                self.clean_intermediate(output_dirs)
 
         if final_output and final_status:
             return (final_output[0], final_status[0])
         else:
             return (None, "permanentFail")
 
+    def dispatch_jobs(self, jobs, output_dirs, kwargs):
+        """Run the jobs of the workflow as they become ready."""
+        for runnable in jobs:
+            if runnable:
+                builder = kwargs.get("builder", None)
+                if builder is not None:
+                    runnable.builder = builder
+                if runnable.outdir:
+                    output_dirs.add(runnable.outdir)
+                runnable.run(**kwargs)
+            else:
+                # log.error(
+                #     "Workflow cannot make any more progress"
+                # )
+                # break
+                self.flush_dispatched()
+                with self.phases.phase("waiting"):
+                    self.wait_for_progress()
+        self.flush_dispatched()
+
+    def parallel_map(self, function, items):
+        """Apply ``function`` to ``items`` on the relocation thread pool."""
+        if len(items) < 2:
+            return [function(item) for item in items]
+        pool = ThreadPool(min(self.relocation_workers, len(items)))
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def relocate_outputs(self, output, outdir, output_dirs, action,
+                         fs_access):
+        """Move the final outputs of the workflow into ``outdir``.
+
+        When moving, the outputs which are in intermediate output
+        directories are first moved in parallel, to the paths cwltool would
+        have moved them to. ``relocateOutputs`` then has nothing left to
+        move and only completes the output object.
+        """
+        if action == "move":
+            self.premove_outputs(output, outdir, output_dirs)
+        return relocateOutputs(output, outdir, output_dirs, action,
+                               fs_access)
+
+    def premove_outputs(self, output, outdir, output_dirs):
+        outfiles = []
+        collectFilesAndDirs(output, outfiles)
+        pathmapper = PathMapper(outfiles, "", outdir, separateDirs=False)
+        candidates = {}
+        for _, entry in pathmapper.items():
+            if entry.staged and entry.type in ("File", "Directory") and \
+                    entry.resolved != entry.target and \
+                    any(entry.resolved.startswith(d + "/")
+                        for d in output_dirs):
+                candidates[entry.resolved] = entry.target
+        # outputs nested in one another, or going to the same place, depend
+        # on the order in which they are moved: leave these to cwltool
+        targets = Counter(candidates.values())
+        nested = set()
+        for src in candidates:
+            parent = os.path.dirname(src)
+            while parent not in ("", "/"):
+                if parent in candidates:
+                    nested.update((src, parent))
+                parent = os.path.dirname(parent)
+        moves = sorted((src, dst) for src, dst in candidates.items()
+                       if targets[dst] == 1 and src not in nested)
+
+        def move(paths):
+            try:
+                move_path(*paths)
+                return paths
+            except (IOError, OSError) as e:
+                log.warning("could not move %s to %s: %s",
+                            paths[0], paths[1], e)
+
+        moved = dict(paths for paths in self.parallel_map(move, moves)
+                     if paths)
+
+        def adjust(obj):
+            if not obj.get("location", "").startswith("file://"):
+                return
+            path = uri_file_path(obj["location"])
+            src = path
+            while src not in ("", "/"):
+                if src in moved:
+                    obj["location"] = file_uri(moved[src] + path[len(src):])
+                    obj.pop("path", None)
+                    return
+                src = os.path.dirname(src)
+
+        visit_class(output, ("File", "Directory"), adjust)
+
+    def clean_intermediate(self, output_dirs):
+        """Remove the intermediate output directories left without files."""
+        def clean(output_dir):
+            if os.path.exists(output_dir) and empty_subtree(output_dir):
+                log.debug("Removing intermediate output directory %s",
+                          output_dir)
+                shutil.rmtree(output_dir, True)
+
+        self.parallel_map(clean, sorted(output_dirs))
+
     def make_exec_tool(self, spec, **kwargs):
         raise Exception("Pipeline.make_exec_tool() not implemented")
 
     def make_tool(self, spec, **kwargs):
         raise Exception("Pipeline.make_tool() not implemented")
 
+    def flush_dispatched(self):
+        """Submit the jobs whose submission has been deferred.
+
+        Called by the executor whenever no more jobs are ready, so that jobs
+        becoming ready at the same time can be submitted together.
+        """
+        pass
+
     def add_thread(self, thread):
         self.threads.append(thread)
+        PIPELINE_THREADS.inc()
+
+    def job_started(self):
+        """Register a job whose completion :meth:`wait` has to wait for."""
+        JOBS_IN_FLIGHT.inc()
+        with self.jobs_condition:
+            self.pending_jobs += 1
+
+    def job_finished(self):
+        """Signal that a job registered with :meth:`job_started` is done."""
+        JOBS_IN_FLIGHT.dec()
+        with self.jobs_condition:
+            self.pending_jobs -= 1
+            self.jobs_changed = True
+            self.jobs_condition.notify_all()
+
+    def wait_for_progress(self, timeout=1):
+        """Block until a job finishes since the last call.
+
+        Used by the executor when no step is ready to run: the next step can
+        only become ready once one of the running jobs has finished. If no
+        job is running at all, give up after ``timeout`` seconds so that the
+        executor can check again.
+        """
+        with self.jobs_condition:
+            if not self.jobs_changed and self.pending_jobs == 0:
+                self.jobs_condition.wait(timeout)
+            while not self.jobs_changed and self.pending_jobs > 0:
+                self.jobs_condition.wait()
+            self.jobs_changed = False
 
     def wait(self):
-        while True:
-            if all([not t.is_alive() for t in self.threads]):
-                break
+        with self.jobs_condition:
+            while self.pending_jobs > 0:
+                self.jobs_condition.wait()
         for t in self.threads:
+            if hasattr(t, "stop"):
+                t.stop()
             t.join()
+            PIPELINE_THREADS.dec()
 
 
 class PipelineJob(JobBase):
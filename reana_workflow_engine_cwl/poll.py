@@ -1,26 +1,250 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+import random
 import threading
+import time
+from collections import OrderedDict
+
+
+class PollPolicy(object):
+    """Decide how long to wait between two polls of the same operation.
+
+    Operations are first polled after ``initial_interval`` seconds, then the
+    interval grows by ``factor`` up to ``max_interval``. Every interval is
+    randomised by up to ``jitter`` (a fraction of the interval) so that
+    operations submitted together do not keep being polled together.
+
+    With ``use_history``, the runtimes of finished operations are remembered
+    per key (e.g. the tool they run) and the first poll of a new operation
+    with the same key is delayed to ``history_fraction`` of the usual runtime.
+    """
+
+    def __init__(self, initial_interval=1, factor=1.5, max_interval=30,
+                 jitter=0.1, use_history=False, history_fraction=0.5):
+        self.initial_interval = initial_interval
+        self.factor = factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.use_history = use_history
+        self.history_fraction = history_fraction
+        self.runtimes = {}
+        self.lock = threading.Lock()
+
+    def first_interval(self, key=None):
+        interval = self.initial_interval
+        if self.use_history and key is not None:
+            with self.lock:
+                runtime = self.runtimes.get(key)
+            if runtime is not None:
+                interval = max(interval, runtime * self.history_fraction)
+        return interval
+
+    def next_interval(self, interval):
+        return min(max(interval * self.factor, self.initial_interval),
+                   max(self.max_interval, self.initial_interval))
+
+    def jittered(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def record(self, key, runtime):
+        """Remember how long an operation with the given key ran."""
+        if not self.use_history or key is None:
+            return
+        with self.lock:
+            previous = self.runtimes.get(key)
+            if previous is None:
+                self.runtimes[key] = runtime
+            else:
+                self.runtimes[key] = 0.7 * previous + 0.3 * runtime
+
+
+class PolledOperation(object):
+
+    def __init__(self, operation, callback, name=None, key=None, retries=10,
+                 interval=1):
+        self.operation = operation
+        self.id = operation['job_id']
+        self.callback = callback
+        self.name = name or self.id
+        self.key = key
+        self.retries = retries
+        self.polls = 0
+        self.pushed = None
+        self.interval = interval
+        self.started = time.time()
+        self.next_poll = self.started + interval
+        self.transitions = {}
+        self.observe(operation)
+
+    def observe(self, operation):
+        """Take the new state of the operation into account.
+
+        ``transitions`` records when each status was first seen.
+        """
+        self.operation = operation
+        self.transitions.setdefault(operation.get('status'), time.time())
 
 
 class PollThread(threading.Thread):
+    """Poll the status of many operations from a single thread.
+
+    Operations are registered with :meth:`watch` and polled when their
+    :class:`PollPolicy` says so. At most ``poll_batch_size`` operations are
+    polled at once, the most overdue first, so that the number of threads
+    and the request rate do not depend on how many operations are in
+    flight. ``poll_counts`` records how many polls each finished operation
+    took.
+
+    Status changes learnt from elsewhere can be pushed with :meth:`notify`;
+    they are handled right away as if they had just been polled. A change
+    pushed for an operation not watched yet, such as a job whose submission
+    has not returned, is kept for ``unknown_retention`` seconds and handled
+    once the operation is watched.
+    """
 
-    def __init__(self, operation, poll_interval=1, poll_retries=10):
+    def __init__(self, policy=None, poll_retries=10, poll_batch_size=100,
+                 unknown_retention=60):
         super(PollThread, self).__init__()
         self.daemon = True
-        self.operation = operation
-        self.id = operation['job_id']
-        self.poll_interval = poll_interval
+        self.policy = policy or PollPolicy()
         self.poll_retries = poll_retries
+        self.poll_batch_size = poll_batch_size
+        self.unknown_retention = unknown_retention
+        self.operations = {}
+        self.unknown = OrderedDict()
+        self.poll_counts = {}
+        self.total_polls = 0
+        self.condition = threading.Condition()
+        self.stopped = False
+
+    def watch(self, operation, callback, name=None, key=None):
+        polled = PolledOperation(operation, callback, name=name, key=key,
+                                 retries=self.poll_retries,
+                                 interval=self.policy.first_interval(key))
+        polled.next_poll = polled.started + self.policy.jittered(
+            polled.interval)
+        with self.condition:
+            pushed = self.unknown.pop(polled.id, None)
+            if pushed is not None:
+                polled.pushed = pushed[1]
+                polled.next_poll = 0
+            self.operations[polled.id] = polled
+            self.condition.notify_all()
+        return polled
 
-    def poll(self):
-        raise Exception("PollThread.poll() not implemented")
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
 
-    def is_done(self, operation):
-        raise Exception("PollThread.is_done(operation) not implemented")
+    def notify(self, operation):
+        """Report the new state of a watched operation without polling it."""
+        with self.condition:
+            polled = self.operations.get(operation['job_id'])
+            if polled is None:
+                now = time.time()
+                # oldest first: drop the changes kept for too long
+                while self.unknown:
+                    operation_id, (received, _) = next(
+                        iter(self.unknown.items()))
+                    if now - received <= self.unknown_retention:
+                        break
+                    del self.unknown[operation_id]
+                self.unknown.pop(operation['job_id'], None)
+                self.unknown[operation['job_id']] = (now, operation)
+                return
+            polled.pushed = operation
+            polled.next_poll = 0
+            self.condition.notify_all()
 
-    def complete(self, operation):
-        raise Exception("PollThread.complete(operation) not implemented")
+    def next_batch(self):
+        """Wait until some operations are due and return them.
+
+        Returns ``None`` once the thread has been stopped.
+        """
+        with self.condition:
+            while not self.stopped:
+                if not self.operations:
+                    self.condition.wait()
+                    continue
+                now = time.time()
+                due = sorted((p for p in self.operations.values()
+                              if p.next_poll <= now),
+                             key=lambda p: p.next_poll)
+                if due:
+                    return due[:self.poll_batch_size]
+                next_poll = min(p.next_poll
+                                for p in self.operations.values())
+                self.condition.wait(next_poll - now)
+            return None
+
+    def reschedule(self, polled):
+        polled.interval = self.policy.next_interval(polled.interval)
+        next_poll = time.time() + self.policy.jittered(polled.interval)
+        with self.condition:
+            # keep a state pushed meanwhile due right away
+            if polled.pushed is None:
+                polled.next_poll = next_poll
+
+    def finish(self, polled):
+        """Stop watching ``polled`` and complete it, at most once."""
+        with self.condition:
+            if self.operations.pop(polled.id, None) is None:
+                return
+            self.poll_counts[polled.id] = polled.polls
+        if polled.retries >= 0:
+            self.policy.record(polled.key, time.time() - polled.started)
+        self.complete(polled)
 
     def run(self):
-        raise Exception("PollThread.run() not implemented")
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                break
+            operations = {}
+            with self.condition:
+                for polled in batch:
+                    if polled.pushed is not None:
+                        operations[polled.id] = polled.pushed
+                        polled.pushed = None
+            to_poll = [polled for polled in batch
+                       if polled.id not in operations]
+            for polled in to_poll:
+                polled.polls += 1
+            self.total_polls += len(to_poll)
+            if to_poll:
+                try:
+                    operations.update(
+                        self.poll([polled.id for polled in to_poll]))
+                except Exception as e:
+                    self.poll_failed(to_poll, e)
+            for polled in batch:
+                if polled.id not in operations:
+                    polled.retries -= 1
+                    if polled.retries < 0:
+                        self.finish(polled)
+                    else:
+                        self.reschedule(polled)
+                    continue
+                polled.observe(operations[polled.id])
+                try:
+                    done = self.is_done(polled)
+                except Exception as e:
+                    self.poll_failed([polled], e)
+                    done = True
+                if done:
+                    self.finish(polled)
+                else:
+                    self.reschedule(polled)
+
+    def poll(self, operation_ids):
+        raise Exception("PollThread.poll(operation_ids) not implemented")
+
+    def poll_failed(self, batch, error):
+        pass
+
+    def is_done(self, polled):
+        raise Exception("PollThread.is_done(polled) not implemented")
+
+    def complete(self, polled):
+        raise Exception("PollThread.complete(polled) not implemented")
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Profiling of workflow runs.
+
+A run is split into phases (code staging, document loading, validation,
+job dispatch, waiting for jobs, output relocation) whose wall-clock time is
+measured with a :class:`PhaseTimer`. When a run is profiled, the thread
+running the workflow is also profiled with :mod:`cProfile`, and both are
+written to the workflow workspace by :class:`WorkflowProfile`.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+log = logging.getLogger(__name__)
+
+PROFILE_DIR_NAME = 'profile'
+
+
+class PhaseTimer(object):
+    """Wall-clock time spent in named phases.
+
+    Phases may be nested: the time of a phase does not include the time of
+    the phases run inside it, so that the phases add up to the time
+    measured. Time spent in the same phase several times is added up.
+    Phases are meant to be entered from the thread running the workflow.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.seconds = {}
+        self.stack = []
+
+    @contextmanager
+    def phase(self, name):
+        self.add(name, 0)
+        started = time.time()
+        self.stack.append(0)
+        try:
+            yield
+        finally:
+            nested = self.stack.pop()
+            elapsed = time.time() - started
+            if self.stack:
+                self.stack[-1] += elapsed
+            self.add(name, elapsed - nested)
+
+    def add(self, name, seconds):
+        if name not in self.seconds:
+            self.phases.append(name)
+            self.seconds[name] = 0
+        self.seconds[name] += seconds
+
+    def as_list(self):
+        """Return the phases, in the order first entered, with their time."""
+        return [(name, self.seconds[name]) for name in self.phases]
+
+    def __str__(self):
+        return ', '.join('{0} {1:.3f}s'.format(name, seconds)
+                         for name, seconds in self.as_list())
+
+
+@contextmanager
+def timed_calls(module, name, timer, phase):
+    """Account the calls to ``module.name`` to ``phase`` of ``timer``.
+
+    The function is replaced in ``module`` for the duration of the block,
+    which is how the loading and validation done inside cwltool are timed.
+    """
+    function = getattr(module, name)
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        with timer.phase(phase):
+            return function(*args, **kwargs)
+
+    setattr(module, name, timed)
+    try:
+        yield
+    finally:
+        setattr(module, name, function)
+
+
+class WorkflowProfile(object):
+    """cProfile profile and phase timings of one workflow run.
+
+    Use as a context manager around the run. The profile covers the thread
+    entering the context only: job submission is profiled, the status poll
+    and job threads are not.
+    """
+
+    def __init__(self, timer=None):
+        self.timer = timer if timer is not None else PhaseTimer()
+        self.profiler = cProfile.Profile()
+        self.started = None
+        self.wall_time = None
+
+    def __enter__(self):
+        self.started = time.time()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.wall_time = time.time() - self.started
+
+    def write(self, directory, top=50):
+        """Write the profile into ``directory``.
+
+        Three files are written: ``phases.json`` with the phase timings,
+        ``profile.pstats`` with the raw profile, to load with :mod:`pstats`
+        or a profile viewer, and ``profile.txt`` with both in readable
+        form, functions sorted by cumulative time.
+
+        :returns: The path of ``profile.txt``.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        phases = self.timer.as_list()
+        measured = sum(seconds for _, seconds in phases)
+        if self.wall_time is not None:
+            phases.append(('other', max(self.wall_time - measured, 0)))
+        with open(os.path.join(directory, 'phases.json'), 'w') as f:
+            json.dump({'wall_time': self.wall_time,
+                       'phases': [{'name': name, 'seconds': seconds}
+                                  for name, seconds in phases]},
+                      f, indent=2)
+        self.profiler.dump_stats(os.path.join(directory, 'profile.pstats'))
+
+        stream = StringIO()
+        stream.write('wall time: {0:.3f}s\n\n'.format(
+            self.wall_time or measured))
+        for name, seconds in phases:
+            stream.write('{0:<12} {1:10.3f}s\n'.format(name, seconds))
+        stream.write('\n')
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(top)
+        text_path = os.path.join(directory, 'profile.txt')
+        with open(text_path, 'w') as f:
+            f.write(stream.getvalue())
+        log.info('profile written to %s', text_path)
+        return text_path
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# REANA; if not, write to the Free Software Foundation, Inc., 59 Temple Place,
+# Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Staging of files with as little copying as the file system allows.
+
+Three strategies are available and tried in the configured order:
+
+- ``hardlink``: link the destination to the same inode. Free, but the job
+  can then modify the original, so only use it for tools which replace
+  rather than modify their writable inputs.
+- ``reflink``: clone the file on copy-on-write file systems (Btrfs, XFS,
+  ...). Free until the job writes to it, and the original stays intact.
+- ``copy``: plain copy, always possible.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+from multiprocessing.pool import ThreadPool
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+STRATEGIES = ('hardlink', 'reflink', 'copy')
+
+FICLONE = 0x40049409
+"""Linux ioctl cloning a whole file (``_IOW(0x94, 9, int)``)."""
+
+
+class StagingMetrics(object):
+    """Count the bytes and files staged by copying and by linking."""
+
+    def __init__(self):
+        self.bytes_copied = 0
+        self.bytes_linked = 0
+        self.files_copied = 0
+        self.files_linked = 0
+        self.files_unchanged = 0
+
+    def add(self, strategy, size):
+        if strategy is None:
+            self.files_unchanged += 1
+        elif strategy == 'copy':
+            self.bytes_copied += size
+            self.files_copied += 1
+        else:
+            self.bytes_linked += size
+            self.files_linked += 1
+
+    def __str__(self):
+        return ('{0} files ({1} bytes) copied, '
+                '{2} files ({3} bytes) linked, '
+                '{4} files unchanged').format(
+                    self.files_copied, self.bytes_copied,
+                    self.files_linked, self.bytes_linked,
+                    self.files_unchanged)
+
+
+def reflink(src, dst):
+    """Clone ``src`` to ``dst`` sharing their data blocks.
+
+    :raises OSError: If the file system does not support it.
+    """
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, 'reflinks are not supported')
+    with open(src, 'rb') as source:
+        try:
+            with open(dst, 'wb') as destination:
+                fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        except (IOError, OSError):
+            os.remove(dst)
+            raise
+    shutil.copymode(src, dst)
+
+
+def stage_file(src, dst, strategies=STRATEGIES, metrics=None):
+    """Make the file ``src`` available as ``dst``.
+
+    :param strategies: Staging strategies to try, in order.
+    :param metrics: :class:`StagingMetrics` to account the file to.
+    :returns: The strategy which succeeded.
+    """
+    error = None
+    for strategy in strategies:
+        try:
+            if strategy == 'hardlink':
+                os.link(src, dst)
+            elif strategy == 'reflink':
+                reflink(src, dst)
+            elif strategy == 'copy':
+                shutil.copy(src, dst)
+            else:
+                raise ValueError('unknown staging strategy ' + strategy)
+        except (IOError, OSError) as e:
+            error = e
+            continue
+        if metrics is not None:
+            metrics.add(strategy, os.path.getsize(dst))
+        return strategy
+    raise error or OSError(errno.EINVAL, 'no staging strategy given')
+
+
+def stage_tree(src, dst, strategies=STRATEGIES, metrics=None):
+    """Make the directory tree ``src`` available as ``dst``.
+
+    Like :func:`shutil.copytree`, ``dst`` must not exist yet and symbolic
+    links are followed.
+    """
+    os.makedirs(dst)
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if os.path.isdir(src_path):
+            stage_tree(src_path, dst_path, strategies, metrics)
+        else:
+            stage_file(src_path, dst_path, strategies, metrics)
+    shutil.copymode(src, dst)
+
+
+def _sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def sync_directory(src, dst, manifest_path, strategies=STRATEGIES,
+                   workers=8):
+    """Bring the files at the top of ``src`` into ``dst``, incrementally.
+
+    The size and modification time of every file synced, and the inode and
+    change time of its copy, are kept in the JSON manifest at
+    ``manifest_path``, which should be outside of ``dst``. On the next sync,
+    a file is skipped if its copy is still in ``dst`` and either neither of
+    them changed, or its contents are the same as the copy's. The change
+    time of a file cannot be set back, so that a copy modified in place is
+    always noticed. The other files are staged in parallel.
+
+    :returns: :class:`StagingMetrics` of the sync.
+    """
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        manifest = {}
+
+    def sync(name):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        stat = os.stat(src_path)
+        known = manifest.get(name)
+        if known and known[0] == stat.st_size and \
+                os.path.isfile(dst_path):
+            dst_stat = os.stat(dst_path)
+            if dst_stat.st_size == stat.st_size and \
+                    (known[1:] == [stat.st_mtime, dst_stat.st_ino,
+                                   dst_stat.st_ctime] or
+                     _sha1(src_path) == _sha1(dst_path)):
+                return name, _manifest_entry(stat, dst_stat), None, 0
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        strategy = stage_file(src_path, dst_path, strategies)
+        return name, _manifest_entry(stat, os.stat(dst_path)), strategy, \
+            stat.st_size
+
+    names = [name for name in os.listdir(src)
+             if os.path.isfile(os.path.join(src, name))]
+    pool = ThreadPool(workers)
+    try:
+        results = pool.map(sync, names)
+    finally:
+        pool.close()
+        pool.join()
+
+    metrics = StagingMetrics()
+    new_manifest = {}
+    for name, entry, strategy, size in results:
+        new_manifest[name] = entry
+        metrics.add(strategy, size)
+    if not os.path.isdir(os.path.dirname(manifest_path)):
+        os.makedirs(os.path.dirname(manifest_path))
+    tmp_manifest_path = manifest_path + '.tmp'
+    with open(tmp_manifest_path, 'w') as f:
+        json.dump(new_manifest, f)
+    os.rename(tmp_manifest_path, manifest_path)
+    return metrics
+
+
+def _manifest_entry(stat, dst_stat):
+    return [stat.st_size, stat.st_mtime, dst_stat.st_ino, dst_stat.st_ctime]
+
+
+def move_path(src, dst):
+    """Move the file or directory tree ``src`` to ``dst``.
+
+    The move is a rename when both are on the same device. An existing
+    directory ``dst`` is merged with ``src`` entry by entry.
+    """
+    if os.path.isdir(src) and os.path.isdir(dst):
+        for name in os.listdir(src):
+            move_path(os.path.join(src, name), os.path.join(dst, name))
+        return
+    parent = os.path.dirname(dst)
+    if not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    if os.lstat(src).st_dev == os.stat(parent).st_dev:
+        os.rename(src, dst)
+    else:
+        shutil.move(src, dst)
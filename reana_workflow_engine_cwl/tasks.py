@@ -27,22 +27,32 @@ import os
 from glob import glob
 
 import zmq
+from celery import signals
 
-from reana_workflow_engine_cwl import celery_zeromq
+from reana_workflow_engine_cwl import celery_zeromq, metrics
 from reana_workflow_engine_cwl.celeryapp import app
 from reana_workflow_engine_cwl import main
-from reana_workflow_engine_cwl.database import load_session
+from reana_workflow_engine_cwl.database import load_session, remove_session
 from reana_workflow_engine_cwl.models import Workflow, WorkflowStatus
 
 log = logging.getLogger(__name__)
 outputs_dir_name = 'outputs'
 known_dirs = ['inputs', 'logs', outputs_dir_name]
 
+signals.worker_process_init.connect(metrics.start_exporters)
+
 
 @app.task(name='tasks.run_cwl_workflow', ignore_result=True)
 def run_cwl_workflow(workflow_uuid, workflow_workspace,
                         workflow_json=None,
-                        parameters=None):
+                        parameters=None,
+                        profile=False):
+    """Run a CWL workflow.
+
+    :param profile: Whether to profile the run. The profile and the time
+        spent in each phase of the run are written to the ``profile``
+        directory of the workflow workspace.
+    """
     # log.info('getting socket..')
     #
     # zmqctx = celery_zeromq.get_context()
@@ -59,7 +69,8 @@ def run_cwl_workflow(workflow_uuid, workflow_workspace,
         workflow_uuid,
         WorkflowStatus.running, log)
     try:
-        main.main(db_session, workflow_uuid, workflow_json, parameters, workflow_workspace)
+        main.main(db_session, workflow_uuid, workflow_json, parameters,
+                  workflow_workspace, profile=profile)
         Workflow.update_workflow_status(
             db_session,
             workflow_uuid,
@@ -73,3 +84,5 @@ def run_cwl_workflow(workflow_uuid, workflow_workspace,
             WorkflowStatus.failed,
             log,
             message=str(e))
+    finally:
+        remove_session()
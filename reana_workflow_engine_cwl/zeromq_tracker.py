@@ -21,6 +21,14 @@
 # submit itself to any jurisdiction.
 
 import json
+import logging
+import threading
+
+import zmq
+
+from reana_workflow_engine_cwl import celery_zeromq
+
+log = logging.getLogger(__name__)
 
 
 class ZeroMQTracker(object):
@@ -42,3 +50,50 @@ class ZeroMQTracker(object):
     #
     # def finalize(self, adageobj):
     #     self.track(adageobj)
+
+
+class ZeroMQJobSubscriber(threading.Thread):
+    """Listen for job state changes published over ZeroMQ.
+
+    Every message received on the SUB socket is expected to be a JSON
+    object with at least ``job_id`` and ``status``, and is handed to
+    ``on_status``.
+    """
+
+    def __init__(self, connect_string, on_status, topic=b'',
+                 receive_timeout=500):
+        super(ZeroMQJobSubscriber, self).__init__()
+        self.daemon = True
+        self.name = "reana-job-subscriber"
+        self.connect_string = connect_string
+        self.on_status = on_status
+        self.topic = topic
+        self.receive_timeout = receive_timeout
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        socket = celery_zeromq.get_context().socket(zmq.SUB)
+        socket.setsockopt(zmq.SUBSCRIBE, self.topic)
+        socket.connect(self.connect_string)
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+        try:
+            while not self.stopped.is_set():
+                if not poller.poll(self.receive_timeout):
+                    continue
+                message = socket.recv_multipart()[-1]
+                try:
+                    operation = json.loads(message.decode('utf-8'))
+                    operation['job_id'] = str(operation['job_id'])
+                    if 'status' not in operation:
+                        raise KeyError('status')
+                except Exception as e:
+                    log.error('ignoring job status message %r: %s',
+                              message, e)
+                    continue
+                self.on_status(operation)
+        finally:
+            socket.close()
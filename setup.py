@@ -49,6 +49,9 @@ tests_require = [
 ]
 
 extras_require = {
+    'asyncio': [
+        'aiohttp>=3.3.0;python_version>="3.5"',
+    ],
     'docs': [
         'Sphinx>=1.4.4,<1.6',
         'sphinx-rtd-theme>=0.1.9',
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""Pytest configuration for REANA-Workflow-Engine-CWL."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import threading
+
+import pytest
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+class StubJobController(ThreadingMixIn, HTTPServer):
+    """Job controller stand-in serving each connection in a thread."""
+
+    daemon_threads = True
+
+    def process_request_thread(self, request, client_address):
+        self.handler_threads.add(threading.current_thread())
+        ThreadingMixIn.process_request_thread(self, request, client_address)
+
+    def client_thread_count(self):
+        """Count the live threads which do not belong to the server."""
+        return len([t for t in threading.enumerate()
+                    if t not in self.handler_threads])
+
+
+class StubJobControllerHandler(BaseHTTPRequestHandler):
+    """Answer job controller requests from the server's job table."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, body):
+        if isinstance(body, dict):
+            payload = json.dumps(body).encode('utf-8')
+        else:
+            payload = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _create_job(self, job_spec):
+        with self.server.lock:
+            job_id = 'job-{0}'.format(len(self.server.jobs))
+            self.server.jobs[job_id] = {'job_id': job_id,
+                                        'status': self.server.job_status,
+                                        'cmd': job_spec['cmd']}
+        return job_id
+
+    def do_POST(self):
+        self.server.requests.append(self.path)
+        self.server.clients.add(self.client_address)
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if self.path == '/jobs':
+            self._reply(201, {'job_id': self._create_job(body)})
+        elif self.path == '/jobs/batch' and self.server.batch_error:
+            self._reply(self.server.batch_error, {'message': 'Batch failed'})
+        elif self.path == '/jobs/batch' and self.server.bulk:
+            job_ids = [self._create_job(job_spec) for job_spec in body['jobs']]
+            self._reply(201, {'job_ids': job_ids[:self.server.batch_replied]})
+        elif self.path == '/jobs/status' and self.server.bulk:
+            self._reply(200, {'jobs': dict(
+                (job_id, self.server.jobs[job_id])
+                for job_id in body['job_ids']
+                if job_id in self.server.jobs and
+                job_id not in self.server.unlisted)})
+        else:
+            self._reply(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.clients.add(self.client_address)
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 2 and parts[1] in self.server.jobs:
+            self._reply(200, {'job': self.server.jobs[parts[1]]})
+        elif len(parts) == 3 and parts[1] in self.server.jobs:
+            self._reply(200, 'logs of {0}'.format(parts[1]))
+        else:
+            self._reply(404, {'message': 'Not found'})
+
+
+@pytest.fixture
+def job_controller():
+    """Run a stub job controller on a local port.
+
+    Jobs submitted to it immediately get ``job_status``; requested paths
+    and client addresses are recorded in ``requests`` and ``clients``.
+    Checking the status of and submitting batches of jobs are only
+    supported while ``bulk`` is true; the batch status leaves out the jobs
+    in ``unlisted``, and batch submissions fail with ``batch_error`` if
+    set, or only return the first ``batch_replied`` job ids.
+    """
+    server = StubJobController(('127.0.0.1', 0), StubJobControllerHandler)
+    server.bulk = True
+    server.job_status = 'succeeded'
+    server.jobs = {}
+    server.unlisted = set()
+    server.batch_error = None
+    server.batch_replied = None
+    server.lock = threading.Lock()
+    server.requests = []
+    server.clients = set()
+    server.handler_threads = set()
+    server.host = '127.0.0.1:{0}'.format(server.server_port)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db_session(tmpdir):
+    """Session of an SQLite database holding one workflow."""
+    import uuid
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from reana_workflow_engine_cwl.models import Base, Workflow
+    engine = create_engine('sqlite:///' + str(tmpdir.join('reana.db')))
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.workflow_uuid = uuid.uuid4()
+    session.add(Workflow(id_=session.workflow_uuid))
+    session.commit()
+    yield session
+    session.close()
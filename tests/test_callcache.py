@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL call cache tests."""
+
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+from reana_workflow_engine_cwl.callcache import CallCache, path_checksum
+
+
+def _make_outdir(path, files):
+    os.makedirs(path)
+    for name, content in files.items():
+        full_path = os.path.join(path, name)
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        with open(full_path, 'w') as f:
+            f.write(content)
+
+
+def test_key_depends_on_input_contents(tmpdir):
+    """Test that the key changes with the contents of an input."""
+    data = tmpdir.join('data.txt')
+    data.write('1 2 3')
+    first = CallCache.key('busybox', 'wc $WORKSPACE/data.txt',
+                          {'/data.txt': path_checksum(str(data))}, [])
+    assert first == CallCache.key('busybox', 'wc $WORKSPACE/data.txt',
+                                  {'/data.txt': path_checksum(str(data))},
+                                  [])
+    time.sleep(0.01)
+    data.write('4 5 6')
+    assert first != CallCache.key('busybox', 'wc $WORKSPACE/data.txt',
+                                  {'/data.txt': path_checksum(str(data))},
+                                  [])
+
+
+def test_store_and_lookup(tmpdir):
+    """Test that stored outputs are materialized into a new outdir."""
+    cache = CallCache(str(tmpdir.join('cache')), max_size=1024)
+    outdir = str(tmpdir.join('run1'))
+    _make_outdir(outdir, {'result.txt': 'ok', 'plots/a.png': 'png'})
+    assert not cache.lookup('key', str(tmpdir))
+    cache.store('key', outdir)
+
+    new_outdir = str(tmpdir.join('run2'))
+    os.makedirs(new_outdir)
+    assert cache.lookup('key', new_outdir)
+    with open(os.path.join(new_outdir, 'plots', 'a.png')) as f:
+        assert f.read() == 'png'
+    with open(os.path.join(new_outdir, 'result.txt')) as f:
+        assert f.read() == 'ok'
+
+
+def test_partly_evicted_entry_is_a_miss(tmpdir):
+    """Test that an entry losing files while copied leaves nothing."""
+    cache = CallCache(str(tmpdir.join('cache')), max_size=1024)
+    outdir = str(tmpdir.join('run1'))
+    _make_outdir(outdir, {'result.txt': 'ok', 'plots/a.png': 'png'})
+    cache.store('key', outdir)
+    # what another worker evicting the entry leaves while it is copied
+    os.remove(str(tmpdir.join('cache', 'key', 'outputs', 'plots', 'a.png')))
+
+    new_outdir = str(tmpdir.join('run2'))
+    os.makedirs(new_outdir)
+    assert not cache.lookup('key', new_outdir)
+    assert os.listdir(new_outdir) == []
+
+
+def test_linked_outputs_are_copied(tmpdir):
+    """Test that entries do not link into the workspace they come from."""
+    cache = CallCache(str(tmpdir.join('cache')), max_size=1024)
+    workspace = tmpdir.mkdir('workspace')
+    workspace.join('input.txt').write('data')
+    outdir = str(tmpdir.join('run1'))
+    _make_outdir(outdir, {})
+    os.symlink(str(workspace.join('input.txt')),
+               os.path.join(outdir, 'input.txt'))
+    cache.store('key', outdir)
+    workspace.remove()
+
+    new_outdir = str(tmpdir.join('run2'))
+    os.makedirs(new_outdir)
+    assert cache.lookup('key', new_outdir)
+    assert not os.path.islink(os.path.join(new_outdir, 'input.txt'))
+    with open(os.path.join(new_outdir, 'input.txt')) as f:
+        assert f.read() == 'data'
+
+
+def test_least_recently_used_entries_are_evicted(tmpdir):
+    """Test that the cache is kept below its maximum size."""
+    cache = CallCache(str(tmpdir.join('cache')), max_size=250)
+    for i in range(3):
+        outdir = str(tmpdir.join('run{0}'.format(i)))
+        _make_outdir(outdir, {'out': 'x' * 100})
+        cache.store('key{0}'.format(i), outdir)
+        # make the order of use unambiguous
+        entry = os.path.join(cache.directory, 'key{0}'.format(i))
+        os.utime(entry, (i, i))
+        if i == 1:
+            # key0 is used again, key1 is now the least recently used
+            os.utime(os.path.join(cache.directory, 'key0'), (5, 5))
+    assert sorted(os.listdir(cache.directory)) == ['key0', 'key2']
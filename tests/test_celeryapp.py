@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+
+"""REANA-Workflow-Engine-CWL Celery application tests."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+WORKER = '''
+import json, os, sys, time
+started = time.time()
+from celery import signals
+from reana_workflow_engine_cwl.celeryapp import app
+app.loader.import_default_modules()
+if sys.argv[1] == 'preload':
+    signals.worker_init.send(sender=None)
+forked = time.time()
+read_end, write_end = os.pipe()
+if os.fork() == 0:
+    # what the first workflow of a pool process loads lazily
+    from cwltool.process import get_schema
+    get_schema('v1.0')
+    os.write(write_end, str(time.time()).encode())
+    os._exit(0)
+ready = float(os.read(read_end, 64))
+os.wait()
+print(json.dumps({'startup': forked - started,
+                  'first_job': ready - forked,
+                  'total': ready - started}))
+'''
+
+
+def _fresh_worker(mode):
+    """Return the timings of a fresh worker forking a pool process."""
+    output = subprocess.check_output([sys.executable, '-c', WORKER, mode],
+                                     env=dict(os.environ))
+    return json.loads(output.decode().splitlines()[-1])
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_time_to_first_job():
+    """Benchmark time-to-first-job of a pool process of a fresh worker."""
+    cold = _fresh_worker('lazy')
+    warm = _fresh_worker('preload')
+    for name, timings in (('lazy', cold), ('preload', warm)):
+        print('{0}: startup {1[startup]:.3f}s, first job {1[first_job]:.3f}s, '
+              'total {1[total]:.3f}s'.format(name, timings))
+    assert warm['first_job'] < cold['first_job']
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL REANA pipeline tests."""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+import pytest
+
+
+class StubJob(object):
+    """Minimal stand-in for a ReanaPipelineJob."""
+
+    def __init__(self, name):
+        self.name = name
+        self.spec = {'id': '#stub'}
+
+
+def test_ready_jobs_are_submitted_in_batches(job_controller, tmpdir):
+    """Test that jobs dispatched together are submitted together."""
+    from reana_workflow_engine_cwl.cwl_reana import ReanaPipeline
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    from reana_workflow_engine_cwl.poll import PollPolicy
+    pipeline = ReanaPipeline(str(tmpdir), {})
+    pipeline.service = ReanaJobControllerHTTPClient(host=job_controller.host)
+    pipeline.poll_policy = PollPolicy(initial_interval=0.01)
+    pipeline.submit_batch_size = 400
+    completed = []
+
+    def callback(status=None):
+        completed.append(True)
+        pipeline.job_finished()
+
+    for i in range(1000):
+        task = {'experiment': 'default', 'image': 'busybox',
+                'cmd': 'echo {0}'.format(i)}
+        pipeline.dispatch(StubJob('scatter_{0}'.format(i)), task, callback)
+    pipeline.flush_dispatched()
+    pipeline.wait()
+
+    submissions = [path for path in job_controller.requests
+                   if path.startswith('/jobs/batch')]
+    assert len(submissions) == 3
+    assert len(job_controller.jobs) == 1000
+    assert len(completed) == 1000
+
+
+def test_failed_submissions_fail_their_jobs(job_controller, tmpdir):
+    """Test that jobs whose batch could not be submitted are finished."""
+    from reana_workflow_engine_cwl.cwl_reana import ReanaPipeline
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    pipeline = ReanaPipeline(str(tmpdir), {})
+    pipeline.service = ReanaJobControllerHTTPClient(host=job_controller.host)
+    job_controller.batch_error = 400
+    statuses = []
+
+    def callback(status=None):
+        statuses.append(status)
+        pipeline.job_finished()
+
+    for i in range(3):
+        task = {'experiment': 'default', 'image': 'busybox',
+                'cmd': 'echo {0}'.format(i)}
+        pipeline.dispatch(StubJob('step_{0}'.format(i)), task, callback)
+    pipeline.flush_dispatched()
+    pipeline.wait()
+
+    assert statuses == ['permanentFail'] * 3
+    assert not job_controller.jobs
+
+
+def test_jobs_without_job_id_fail(job_controller, tmpdir):
+    """Test that jobs a batch reply has no id for are finished."""
+    from reana_workflow_engine_cwl.cwl_reana import ReanaPipeline
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    from reana_workflow_engine_cwl.poll import PollPolicy
+    pipeline = ReanaPipeline(str(tmpdir), {})
+    pipeline.service = ReanaJobControllerHTTPClient(host=job_controller.host)
+    pipeline.poll_policy = PollPolicy(initial_interval=0.01)
+    job_controller.batch_replied = 2
+    statuses = {}
+
+    def make_callback(name):
+        def callback(status=None):
+            statuses[name] = status
+            pipeline.job_finished()
+        return callback
+
+    for i in range(3):
+        name = 'step_{0}'.format(i)
+        task = {'experiment': 'default', 'image': 'busybox',
+                'cmd': 'echo {0}'.format(i)}
+        pipeline.dispatch(StubJob(name), task, make_callback(name))
+    pipeline.flush_dispatched()
+    pipeline.wait()
+
+    assert statuses == {'step_0': 'succeeded', 'step_1': 'succeeded',
+                        'step_2': 'permanentFail'}
+
+
+class StubBuilder(object):
+    """Minimal stand-in for a cwltool Builder."""
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.bindings = []
+
+
+@pytest.fixture
+def job():
+    """ReanaPipelineJob of a tool writing to its output directory."""
+    from reana_workflow_engine_cwl.cwl_reana import (ReanaPipeline,
+                                                     ReanaPipelineJob)
+    working_dir = '/reana/default/00000000/workspace'
+    pipeline = ReanaPipeline(working_dir, {'default_container': 'busybox'})
+    spec = {'id': '#stub',
+            'outputs': [{'id': 'histograms',
+                         'outputBinding': {'glob': 'plots/*.png'}},
+                        {'id': 'table', 'outputBinding': {'glob': 'out.csv'},
+                         'secondaryFiles': ['.idx', '^.schema']}]}
+    job = ReanaPipelineJob(spec, pipeline, working_dir)
+    job.name = 'stub'
+    job.requirements = []
+    job.hints = []
+    job.outdir = working_dir + '/cwl/outdir/job1'
+    job.builder = StubBuilder(working_dir + '/cwl/docker_outdir')
+    job.environment = {'HOME': job.builder.outdir}
+    job.command_line = ['plot', '--out', job.builder.outdir + '/out.csv']
+    job.stdin = job.stdout = job.stderr = None
+    return job
+
+
+def test_job_runs_in_its_outdir(job):
+    """Test that outputs are written in place instead of copied."""
+    cmd = job.create_task_msg()['cmd']
+    assert 'cp ' not in cmd
+    assert 'cd {0} && plot --out {0}/out.csv'.format(job.outdir) in cmd
+    assert 'export HOME="{0}"'.format(job.outdir) in cmd
+    assert job.builder.outdir not in cmd
+
+
+def test_docker_output_directory_outputs_are_moved(job):
+    """Test that only outputs matching the bindings leave the container."""
+    job.hints = [{'class': 'DockerRequirement', 'dockerPull': 'busybox',
+                  'dockerOutputDirectory': '/results'}]
+    job.builder.outdir = '/results'
+    job.environment = {'HOME': '/results'}
+    job.command_line = ['plot', '--out', '/results/out.csv']
+    job.stdout = 'log.txt'
+    job.stderr = 'errors.txt'
+    cmd = job.create_task_msg()['cmd']
+    assert 'cp ' not in cmd
+    assert 'ln -s {0} /results'.format(job.outdir) in cmd
+    assert ('mv -f cwl.output.json errors.txt log.txt out.csv out.csv.idx '
+            'out.schema plots {0}/'.format(job.outdir)) in cmd
+
+    job.spec['outputs'].append(
+        {'id': 'tables', 'outputBinding': {'glob': 'out.*'},
+         'secondaryFiles': ['^.schema']})
+    cmd = job.create_task_msg()['cmd']
+    assert 'mv -f * {0}/'.format(job.outdir) in cmd
+
+    job.spec['outputs'][-1] = \
+        {'id': 'any', 'outputBinding': {'glob': '$(inputs.name)'}}
+    cmd = job.create_task_msg()['cmd']
+    assert 'mv -f * {0}/'.format(job.outdir) in cmd
+
+
+def test_job_timing_recorded(job, db_session):
+    """Test that the timing of a polled job is stored."""
+    from reana_workflow_engine_cwl.models import JobTiming
+    from reana_workflow_engine_cwl.poll import PolledOperation
+    job.timing = {'queued': time.time() - 2, 'staging_time': 0.5,
+                  'collection_time': 0.25}
+    job.staging.add('copy', 1000)
+    job.polled = PolledOperation({'job_id': 'job-1', 'status': 'queued'},
+                                 None)
+    job.polled.polls = 3
+    job.polled.observe({'job_id': 'job-1', 'status': 'started'})
+    job.polled.observe({'job_id': 'job-1', 'status': 'succeeded'})
+
+    JobTiming.add_job_timings(db_session, db_session.workflow_uuid,
+                              [job.timing_record('succeeded')])
+    timing = db_session.query(JobTiming).one()
+    assert (timing.step_name, timing.job_id, timing.image) == \
+        ('stub', 'job-1', 'busybox')
+    assert timing.queued <= timing.submitted <= timing.started <= \
+        timing.finished
+    assert (timing.staging_time, timing.collection_time) == (0.5, 0.25)
+    assert (timing.bytes_staged, timing.poll_count, timing.status) == \
+        (1000, 3, 'succeeded')
+
+
+class _StubMapper(object):
+    """Path mapper of a job's staged inputs."""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def items(self):
+        return self.entries.items()
+
+
+def test_command_paths_translated(job):
+    """Benchmark command construction for a job with many inputs."""
+    from cwltool.pathmapper import MapperEnt
+    inputs = 5000
+    job.pathmapper = _StubMapper(dict(
+        ('file:///reana/default/00000000/inputs/{0}.root'.format(i),
+         MapperEnt('/reana/default/00000000/inputs/{0}.root'.format(i),
+                   '/var/lib/cwl/stg{0}/{0}.root'.format(i), 'File', True))
+        for i in range(inputs)))
+    job.add_volumes(job.pathmapper)
+    job.requirements = [{'class': 'InlineJavascriptRequirement'}]
+    job.hints = [{'class': 'DockerRequirement', 'dockerPull': 'busybox'}]
+    job.builder.tmpdir = '/tmp'
+    job.tmpdir = '/reana/default/00000000/workspace/cwl/tmpdir/job1'
+    job.command_line = ['merge', '--tmp', '/tmp', '--keep', '/tmp/a/b/c',
+                        '--out', job.builder.outdir] + \
+        ['/var/lib/cwl/stg{0}/{0}.root'.format(i) for i in range(inputs)]
+
+    start = time.time()
+    cmd = job.create_task_msg()['cmd']
+    print('{0} inputs: command built in {1:.3f}s'.format(
+        inputs, time.time() - start))
+    assert '/var/lib/cwl' not in cmd
+    assert 'ln -s' not in cmd
+    assert ' /reana/default/00000000/inputs/4999.root' in cmd
+    assert '--tmp {0} --keep {0}/a/b/c --out {1} '.format(
+        job.tmpdir, job.outdir) in cmd
+
+
+def test_call_cache_key_stable_across_runs(job, tmpdir):
+    """Test that where cwltool stages inputs does not change the key."""
+    from cwltool.pathmapper import PathMapper
+    data = tmpdir.join('data.csv')
+    data.write('1,2,3')
+    stagedir = job.working_dir + '/cwl/docker_stagedir'
+    job.tmpdir = job.working_dir + '/cwl/tmpdir/job1'
+    keys = []
+    for _ in range(2):
+        job.pathmapper = PathMapper(
+            [{'class': 'File', 'location': 'file://' + str(data),
+              'basename': 'data.csv'}], '', stagedir)
+        target = list(job.pathmapper.items())[0][1].target
+        assert '/stg' in target
+        job.volumes = []
+        job.add_volumes(job.pathmapper)
+        job.command_line = ['wc', '-l', target]
+        task = job.create_task_msg()
+        assert target in task['cmd']
+        keys.append(job.call_cache_key(task))
+    assert keys[0] == keys[1]
+
+    time.sleep(0.01)
+    data.write('4,5,6,7')
+    assert job.call_cache_key(task) != keys[1]
+
+
+@pytest.mark.parametrize('job_status,process_status', [
+    ('succeeded', 'success'), ('failed', 'permanentFail')])
+def test_job_status_reported(job, job_controller, tmpdir, job_status,
+                             process_status):
+    """Test that the final state of a job is reported to cwltool."""
+    from cwltool.pathmapper import PathMapper
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    from reana_workflow_engine_cwl.poll import PollPolicy
+    pipeline = job.pipeline
+    pipeline.service = ReanaJobControllerHTTPClient(host=job_controller.host)
+    pipeline.poll_policy = PollPolicy(initial_interval=0.01)
+    job_controller.job_status = job_status
+    job.outdir = str(tmpdir.join('outdir'))
+    job.tmpdir = str(tmpdir.join('tmpdir'))
+    job.stagedir = None
+    job.pathmapper = PathMapper([], '', str(tmpdir.join('stagedir')))
+    job.collect_outputs = lambda outdir: {'table': None}
+    reported = []
+    job.output_callback = lambda out, status: reported.append(status)
+
+    job.run()
+    pipeline.flush_dispatched()
+    pipeline.wait()
+
+    assert reported == [process_status]
+
+
+def test_job_without_status_fails():
+    """Test that a job whose status was never retrieved is not done."""
+    from reana_workflow_engine_cwl.cwl_reana import ReanaPipelinePoll
+    from reana_workflow_engine_cwl.poll import PolledOperation
+    statuses = []
+    polled = PolledOperation({'job_id': 'job-1', 'status': 'queued'},
+                             statuses.append, retries=0)
+    polled.retries -= 1
+    ReanaPipelinePoll(service=None).complete(polled)
+    assert statuses == [None]
+
+
+class SlowLogsService(object):
+    """Job controller client whose jobs end at once, with slow logs."""
+
+    def __init__(self, statuses, delay):
+        self.statuses = statuses
+        self.delay = delay
+        self.logs_fetched = []
+
+    def check_status_many(self, job_ids):
+        return dict((job_id, {'job_id': job_id,
+                              'status': self.statuses[job_id]})
+                    for job_id in job_ids)
+
+    def get_logs(self, job_id):
+        time.sleep(self.delay)
+        self.logs_fetched.append(job_id)
+        return 'logs of ' + job_id
+
+
+def test_failed_job_logs_do_not_hold_up_polling():
+    """Test that fetching the logs of a failed job is done aside."""
+    import threading
+    from reana_workflow_engine_cwl.cwl_reana import ReanaPipelinePoll
+    from reana_workflow_engine_cwl.poll import PollPolicy
+    service = SlowLogsService({'job-1': 'failed', 'job-2': 'succeeded'}, 1)
+    poller = ReanaPipelinePoll(service=service,
+                               policy=PollPolicy(initial_interval=0.01))
+    done = dict((job_id, threading.Event()) for job_id in service.statuses)
+    poller.watch({'job_id': 'job-1', 'status': 'queued'},
+                 lambda status: done['job-1'].set())
+    poller.start()
+    try:
+        assert done['job-1'].wait(0.5)
+        started = time.time()
+        poller.watch({'job_id': 'job-2', 'status': 'queued'},
+                     lambda status: done['job-2'].set())
+        assert done['job-2'].wait(0.5)
+        assert time.time() - started < 0.5
+    finally:
+        poller.stop()
+        poller.join()
+    assert service.logs_fetched == ['job-1']
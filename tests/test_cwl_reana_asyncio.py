@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL asyncio execution mode tests."""
+
+from __future__ import absolute_import, print_function
+
+import sys
+
+import pytest
+
+
+class StubJob(object):
+    """Minimal stand-in for a ReanaPipelineJob."""
+
+    def __init__(self, name):
+        self.name = name
+        self.spec = {'id': '#stub'}
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5),
+                    reason='asyncio execution mode requires Python 3.5')
+def test_many_jobs_on_one_event_loop(job_controller, tmpdir):
+    """Test that many jobs are driven without a thread per job."""
+    from reana_workflow_engine_cwl.cwl_reana_asyncio import \
+        AsyncReanaPipeline
+    from reana_workflow_engine_cwl.poll import PollPolicy
+    pipeline = AsyncReanaPipeline(str(tmpdir), {})
+    pipeline.async_service.host = job_controller.host
+    pipeline.poll_policy = PollPolicy(initial_interval=0.01)
+    completed = []
+    max_threads = [job_controller.client_thread_count()]
+
+    def make_callback(name):
+        def callback(status=None):
+            completed.append(name)
+            max_threads[0] = max(max_threads[0],
+                                 job_controller.client_thread_count())
+            pipeline.job_finished()
+        return callback
+
+    threads_before = job_controller.client_thread_count()
+    for i in range(500):
+        name = 'step_{0}'.format(i)
+        task = {'experiment': 'default', 'image': 'busybox', 'cmd': 'true'}
+        pipeline.dispatch(StubJob(name), task, make_callback(name))
+    pipeline.wait()
+
+    assert len(completed) == 500
+    assert len(job_controller.jobs) == 500
+    # the jobs due together are checked in one request
+    status_requests = [path for path in job_controller.requests
+                       if path.startswith('/jobs/status')]
+    print('{0} status requests'.format(len(status_requests)))
+    assert len(status_requests) < 100
+    assert not [path for path in job_controller.requests
+                if path.startswith('/jobs/job-')]
+    # the event loop and the callback thread, whatever the number of jobs
+    assert max_threads[0] <= threads_before + 2
+    assert pipeline.loop is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5),
+                    reason='asyncio execution mode requires Python 3.5')
+def test_failed_submissions_fail_their_jobs(tmpdir):
+    """Test that jobs which could not be submitted are finished."""
+    import socket
+    from reana_workflow_engine_cwl.cwl_reana_asyncio import \
+        AsyncReanaPipeline
+    # a port nothing listens on
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    host = '127.0.0.1:{0}'.format(probe.getsockname()[1])
+    probe.close()
+    pipeline = AsyncReanaPipeline(str(tmpdir), {})
+    pipeline.async_service.host = host
+    statuses = []
+
+    def callback(status=None):
+        statuses.append(status)
+        pipeline.job_finished()
+
+    for i in range(3):
+        task = {'experiment': 'default', 'image': 'busybox', 'cmd': 'true'}
+        pipeline.dispatch(StubJob('step_{0}'.format(i)), task, callback)
+    pipeline.wait()
+
+    assert statuses == ['permanentFail'] * 3
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5),
+                    reason='asyncio execution mode requires Python 3.5')
+def test_pushed_states_fallback_not_used(tmpdir, monkeypatch):
+    """Test that jobs are not polled as if their states were pushed."""
+    from reana_workflow_engine_cwl import cwl_reana
+    from reana_workflow_engine_cwl.cwl_reana_asyncio import \
+        AsyncReanaPipeline
+    monkeypatch.setattr(cwl_reana, 'JOB_STATUS_ZMQ_CONNECT',
+                        'tcp://127.0.0.1:5555')
+    assert cwl_reana.ReanaPipeline(str(tmpdir), {}).poll_policy \
+        .initial_interval == cwl_reana.POLL_FALLBACK_INTERVAL
+    pipeline = AsyncReanaPipeline(str(tmpdir), {})
+    assert pipeline.job_status_connect is None
+    assert pipeline.poll_policy.initial_interval == \
+        cwl_reana.POLL_INITIAL_INTERVAL
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL workflow log storage tests."""
+
+from __future__ import absolute_import, print_function
+
+import io
+import logging
+import time
+
+from sqlalchemy import event
+
+
+def _logger(handler):
+    logger = logging.getLogger('test-workflow-logs')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def _commit_counter(db_session):
+    commits = []
+    event.listen(db_session, 'after_commit', lambda session: commits.append(1))
+    return commits
+
+
+def test_log_records_written_in_batches(db_session):
+    """Measure commits issued for the debug logs of a large workflow."""
+    from reana_workflow_engine_cwl.database import SQLiteHandler
+    from reana_workflow_engine_cwl.models import WorkflowLog
+    handler = SQLiteHandler(db_session, db_session.workflow_uuid,
+                            stream=io.StringIO(), capacity=100,
+                            flush_interval=60)
+    logger = _logger(handler)
+    commits = _commit_counter(db_session)
+
+    start = time.time()
+    for i in range(2000):
+        logger.debug(u'step %d done', i)
+    handler.close()
+    print('2000 records, {0} commits, {1:.3f}s'.format(
+        len(commits), time.time() - start))
+
+    assert len(commits) == 20
+    logs = WorkflowLog.read_workflow_logs(db_session,
+                                          db_session.workflow_uuid,
+                                          page_size=300)
+    assert logs.splitlines() == [u'step {0} done'.format(i)
+                                 for i in range(2000)]
+
+
+def test_error_record_written_immediately(db_session):
+    """Test that the reason of a failure is never left in the buffer."""
+    from reana_workflow_engine_cwl.database import SQLiteHandler
+    from reana_workflow_engine_cwl.models import WorkflowLog
+    handler = SQLiteHandler(db_session, db_session.workflow_uuid,
+                            stream=io.StringIO(), flush_interval=60)
+    logger = _logger(handler)
+    logger.info(u'starting')
+    assert WorkflowLog.get_workflow_logs(db_session,
+                                         db_session.workflow_uuid) == []
+    logger.error(u'[job plot] step failed')
+    lines = WorkflowLog.get_workflow_logs(db_session,
+                                          db_session.workflow_uuid)
+    assert [(line.sequence, line.level, line.job_name, line.text)
+            for line in lines] == [
+                (0, 'INFO', None, u'starting'),
+                (1, 'ERROR', u'plot', u'[job plot] step failed')]
+
+
+def test_log_lines_appended_at_constant_cost(db_session):
+    """Measure the cost of writing lines as the logs grow."""
+    from reana_workflow_engine_cwl.models import WorkflowLog
+
+    def write(first):
+        start = time.time()
+        WorkflowLog.append_workflow_logs(
+            db_session, db_session.workflow_uuid,
+            [{'sequence': i, 'created': None, 'level': 'INFO',
+              'job_name': None, 'text': u'x' * 100}
+             for i in range(first, first + 1000)])
+        return time.time() - start
+
+    durations = [write(first) for first in range(0, 20000, 1000)]
+    print('first batch {0:.4f}s, last batch {1:.4f}s'.format(
+        durations[0], durations[-1]))
+    assert WorkflowLog.next_sequence(db_session,
+                                     db_session.workflow_uuid) == 20000
+    page = WorkflowLog.get_workflow_logs(db_session, db_session.workflow_uuid,
+                                         after=18999, limit=10)
+    assert [line.sequence for line in page] == list(range(19000, 19010))
+
+
+def test_sqlite_tuned_for_concurrent_workers(tmpdir, monkeypatch):
+    """Test that SQLite connections use a busy timeout, and WAL if set."""
+    from reana_workflow_engine_cwl import database
+    database.init_engine('sqlite:///' + str(tmpdir.join('default.db')))
+    try:
+        session = database.load_session()
+        assert session.execute('PRAGMA journal_mode').scalar() == 'delete'
+    finally:
+        database.remove_session()
+
+    monkeypatch.setattr(database, 'SQLITE_JOURNAL_MODE', 'wal')
+    database.init_engine('sqlite:///' + str(tmpdir.join('reana.db')))
+    try:
+        session = database.load_session()
+        assert session.execute('PRAGMA journal_mode').scalar() == 'wal'
+        assert session.execute('PRAGMA busy_timeout').scalar() > 0
+        assert database.load_session() is session
+        database.remove_session()
+        assert database.load_session() is not session
+    finally:
+        database.remove_session()
+        database.engine.dispose()
+        database.engine = None
+
+
+def test_task_startup_time(tmpdir):
+    """Measure session setup per task with and without a shared engine."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from reana_workflow_engine_cwl import database
+    from reana_workflow_engine_cwl.models import Base, Workflow
+    database_uri = 'sqlite:///' + str(tmpdir.join('reana.db'))
+    Base.metadata.create_all(create_engine(database_uri))
+
+    def per_task_engine():
+        session = sessionmaker(bind=create_engine(database_uri))()
+        session.query(Workflow).first()
+        session.close()
+
+    def shared_engine():
+        session = database.load_session()
+        session.query(Workflow).first()
+        database.remove_session()
+
+    database.init_engine(database_uri)
+    try:
+        durations = []
+        for task in (per_task_engine, shared_engine):
+            start = time.time()
+            for _ in range(100):
+                task()
+            durations.append(time.time() - start)
+    finally:
+        database.engine.dispose()
+        database.engine = None
+    print('100 task startups: {0:.3f}s with an engine per task, '
+          '{1:.3f}s with a shared engine'.format(*durations))
+    assert durations[1] < durations[0]
+
+
+def test_workflow_updates_do_not_load_the_row(db_session):
+    """Test that status and log updates are single UPDATE statements."""
+    from reana_workflow_engine_cwl.models import Workflow, WorkflowStatus
+    workflow = db_session.query(Workflow).one()
+    workflow.specification = {'steps': ['x' * 1000] * 1000}
+    db_session.commit()
+    db_session.expunge_all()
+    statements = []
+    event.listen(db_session.bind, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args:
+                 statements.append(statement.split()[0]))
+
+    Workflow.update_workflow_status(db_session, db_session.workflow_uuid,
+                                    WorkflowStatus.running, logging)
+    Workflow.append_workflow_logs(db_session, db_session.workflow_uuid,
+                                  u'first\n')
+    Workflow.append_workflow_logs(db_session, db_session.workflow_uuid,
+                                  u'second\n')
+    assert statements == ['UPDATE'] * 3
+
+    workflow = db_session.query(Workflow).one()
+    assert workflow.status == WorkflowStatus.running
+    assert 'specification' not in workflow.__dict__
+    assert workflow.logs == u'first\nsecond\n'
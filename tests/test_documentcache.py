@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+
+"""REANA-Workflow-Engine-CWL document cache tests."""
+
+from __future__ import absolute_import, print_function
+
+import copy
+import json
+import os
+import time
+
+import pytest
+
+
+def _workflow(steps):
+    """Return a packed workflow chaining ``steps`` steps."""
+    tool = {
+        'class': 'CommandLineTool',
+        'baseCommand': 'cat',
+        'inputs': [{'id': 'in', 'type': 'File', 'inputBinding': {}}],
+        'outputs': [{'id': 'out', 'type': 'stdout'}],
+    }
+    workflow_steps = []
+    source = 'input'
+    for i in range(steps):
+        workflow_steps.append({'id': 'step{0}'.format(i), 'run': '#tool',
+                               'in': {'in': source}, 'out': ['out']})
+        source = 'step{0}/out'.format(i)
+    return {
+        'cwlVersion': 'v1.0',
+        '$graph': [
+            dict(tool, id='tool'),
+            {'class': 'Workflow', 'id': 'main',
+             'inputs': [{'id': 'input', 'type': 'File'}],
+             'outputs': [{'id': 'output', 'type': 'File',
+                          'outputSource': source}],
+             'steps': workflow_steps},
+        ],
+    }
+
+
+class _SlowValidator(object):
+    """Stands for schema-salad validation: resolves identifiers, slowly.
+
+    Like ``validate_document``, it gets the schema of the document's CWL
+    version from cwltool, which compiles it once per process.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, document_loader, workflowobj, uri, **kwargs):
+        from cwltool.process import get_schema
+        self.calls += 1
+        get_schema(workflowobj['cwlVersion'])
+        time.sleep(self.delay)
+        fileuri = uri.split('#')[0]
+
+        def resolve(obj, scope):
+            if isinstance(obj, dict):
+                obj = dict(obj)
+                if 'id' in obj:
+                    obj['id'] = scope + '#' + obj['id'] if '#' not in scope \
+                        else scope + '/' + obj['id']
+                    scope = obj['id']
+                return {k: resolve(v, scope) for k, v in obj.items()}
+            if isinstance(obj, list):
+                return [resolve(v, scope) for v in obj]
+            return obj
+
+        processobj = resolve(workflowobj['$graph'], fileuri)
+        document_loader.idx[fileuri] = processobj
+        return (document_loader, 'names', processobj,
+                {'cwlVersion': workflowobj['cwlVersion']}, uri)
+
+
+class _DocumentLoader(object):
+
+    def __init__(self):
+        self.idx = {}
+
+
+def test_validated_document_reused_across_workspaces(tmpdir):
+    """Benchmark validating a 100-step workflow submitted repeatedly."""
+    from reana_workflow_engine_cwl.documentcache import DocumentCache
+    spec = _workflow(100)
+    validator = _SlowValidator(0.5)
+    directory = str(tmpdir.join('cache'))
+
+    def validate(cache, workspace):
+        uri = 'file://{0}/inputs/workflow.json#main'.format(workspace)
+        workflowobj = dict(copy.deepcopy(spec), id=uri.split('#')[0])
+        start = time.time()
+        loader, _, processobj, _, _ = cache.wrap(validator)(
+            _DocumentLoader(), workflowobj, uri, strict=True)
+        return time.time() - start, loader, processobj
+
+    # workers compile the schema before running workflows (preloading), so
+    # it is left out of the timings; hits and misses both look it up
+    from cwltool.process import get_schema
+    get_schema(spec['cwlVersion'])
+    cache = DocumentCache(directory)
+    miss, _, processobj = validate(cache, '/reana/default/w1')
+    memory_hit, loader, cached = validate(cache, '/reana/default/w2')
+    disk_hit, _, _ = validate(DocumentCache(directory), '/reana/default/w3')
+    print('100-step workflow: validated in {0:.3f}s, {1:.4f}s from memory, '
+          '{2:.4f}s from disk'.format(miss, memory_hit, disk_hit))
+
+    assert validator.calls == 1
+    assert len(os.listdir(directory)) == 1
+    assert memory_hit < miss / 10 and disk_hit < miss / 10
+    main_id = 'file:///reana/default/w2/inputs/workflow.json#main'
+    assert loader.idx[main_id]['class'] == 'Workflow'
+    assert loader.idx[main_id + '/step99']['run'] == '#tool'
+    assert json.loads(json.dumps(cached).replace('/w2/', '/w1/')) == \
+        processobj
+
+
+def test_documents_pulling_in_other_files_not_cached(tmpdir):
+    """Test that only self-contained documents are cached."""
+    from reana_workflow_engine_cwl.documentcache import DocumentCache
+    cache = DocumentCache(str(tmpdir))
+    validator = _SlowValidator(0)
+    spec = _workflow(2)
+    spec['$graph'][0]['requirements'] = [
+        {'class': 'InitialWorkDirRequirement',
+         'listing': [{'$include': 'script.sh'}]}]
+    for _ in range(2):
+        cache.wrap(validator)(_DocumentLoader(), copy.deepcopy(spec),
+                              'file:///w/inputs/workflow.json#main')
+    assert validator.calls == 2
+    assert not os.listdir(str(tmpdir))
+
+
+def test_cwltool_validation_benchmark(tmpdir):
+    """Benchmark cwltool's own loading of a 100-step workflow."""
+    load_tool = pytest.importorskip('cwltool.load_tool')
+    from reana_workflow_engine_cwl.documentcache import DocumentCache
+    cache = DocumentCache(str(tmpdir.join('cache')))
+    timings = []
+    for i in range(3):
+        inputs = tmpdir.mkdir('w{0}'.format(i)).mkdir('inputs')
+        inputs.join('workflow.json').write(json.dumps(_workflow(100)))
+        uri = 'file://{0}#main'.format(inputs.join('workflow.json'))
+        start = time.time()
+        loader, workflowobj, uri = load_tool.fetch_document(uri)
+        loader, _, _, metadata, uri = cache.wrap(load_tool.validate_document)(
+            loader, workflowobj, uri, strict=True)
+        assert loader.resolve_ref(uri)[0]['class'] == 'Workflow'
+        timings.append(time.time() - start)
+    print('cwltool, 100 steps: {0}'.format(
+        ', '.join('{0:.3f}s'.format(t) for t in timings)))
+    assert max(timings[1:]) < timings[0]
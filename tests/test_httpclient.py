@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL job controller client tests."""
+
+from __future__ import absolute_import, print_function
+
+import pytest
+
+
+@pytest.fixture(params=[True, False], ids=['bulk', 'fallback'])
+def controller(request, job_controller):
+    """Stub job controller with and without batch endpoints."""
+    job_controller.bulk = request.param
+    for i in range(50):
+        job_id = 'job-{0}'.format(i)
+        job_controller.jobs[job_id] = {'job_id': job_id, 'status': 'started'}
+    return job_controller
+
+
+def test_check_status_many_requests_per_cycle(controller):
+    """Measure requests issued per status check cycle."""
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    client = ReanaJobControllerHTTPClient(host=controller.host)
+    job_ids = sorted(controller.jobs) + ['unknown-job']
+
+    for cycle in range(3):
+        del controller.requests[:]
+        statuses = client.check_status_many(job_ids)
+        print('cycle {0}: {1} requests'.format(cycle,
+                                               len(controller.requests)))
+        assert sorted(statuses) == sorted(controller.jobs)
+        assert all(s['status'] == 'started' for s in statuses.values())
+
+    if controller.bulk:
+        # the job the controller does not answer for is checked on its own
+        assert controller.requests == ['/jobs/status', '/jobs/unknown-job']
+    else:
+        # after the first cycle the missing endpoint is not asked for again
+        assert not client.bulk_status_supported
+        assert '/jobs/status' not in controller.requests
+        assert len(controller.requests) == len(job_ids)
+
+
+def test_check_status_many_unlisted_jobs(job_controller):
+    """Test that jobs left out of a batch status are checked one by one."""
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    client = ReanaJobControllerHTTPClient(host=job_controller.host)
+    for i in range(3):
+        job_id = 'job-{0}'.format(i)
+        job_controller.jobs[job_id] = {'job_id': job_id, 'status': 'started'}
+    job_controller.unlisted.add('job-1')
+    try:
+        statuses = client.check_status_many(['job-0', 'job-1', 'job-2'])
+    finally:
+        client.close()
+    assert sorted(statuses) == ['job-0', 'job-1', 'job-2']
+    assert job_controller.requests == ['/jobs/status', '/jobs/job-1']
+    assert client.bulk_status_supported
+    assert client._pool is None
+
+
+def test_connections_are_kept_alive(controller):
+    """Test that consecutive requests reuse the same connection."""
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    client = ReanaJobControllerHTTPClient(host=controller.host)
+    for _ in range(20):
+        assert client.check_status('job-0')['status'] == 'started'
+    assert len(controller.requests) == 20
+    assert len(controller.clients) == 1
+
+
+def test_submit_many_requests(controller):
+    """Measure requests issued to submit a batch of jobs."""
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    client = ReanaJobControllerHTTPClient(host=controller.host)
+    tasks = [{'experiment': 'default', 'image': 'busybox',
+              'cmd': 'echo {0}'.format(i)} for i in range(100)]
+    del controller.requests[:]
+    job_ids = client.submit_many(tasks)
+    print('{0} requests'.format(len(controller.requests)))
+    assert len(set(job_ids)) == 100
+    assert [controller.jobs[job_id]['cmd'] for job_id in job_ids] == \
+        [task['cmd'] for task in tasks]
+    if controller.bulk:
+        assert controller.requests == ['/jobs/batch']
+    else:
+        assert not client.bulk_submit_supported
+        assert len(controller.requests) == 101
+
+
+def test_submit_many_server_error(job_controller):
+    """Test that a batch the controller fails on is not submitted again."""
+    import requests
+    from reana_workflow_engine_cwl.httpclient import \
+        ReanaJobControllerHTTPClient
+    client = ReanaJobControllerHTTPClient(host=job_controller.host)
+    job_controller.batch_error = 500
+    tasks = [{'experiment': 'default', 'image': 'busybox',
+              'cmd': 'echo {0}'.format(i)} for i in range(3)]
+    with pytest.raises(requests.HTTPError):
+        client.submit_many(tasks)
+    assert job_controller.requests == ['/jobs/batch']
+    assert client.bulk_submit_supported
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL log writer thread tests."""
+
+from __future__ import absolute_import, print_function
+
+import io
+import logging
+import threading
+import time
+
+from reana_workflow_engine_cwl.logqueue import QueueLogHandler
+
+
+class SlowHandler(logging.Handler):
+    """Handler taking ``delay`` seconds per record, like a slow commit."""
+
+    def __init__(self, delay):
+        logging.Handler.__init__(self)
+        self.delay = delay
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.threads.add(threading.current_thread().name)
+        self.messages.append(self.format(record))
+
+
+def _logger(handler):
+    logger = logging.getLogger('test-log-queue')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def test_slow_writer_does_not_hold_up_logging():
+    """Measure the time spent logging when writing records is slow."""
+    target = SlowHandler(0.001)
+    handler = QueueLogHandler(target, maxsize=1000)
+    logger = _logger(handler)
+    start = time.time()
+    for i in range(500):
+        logger.info('job %d submitted', i)
+    logging_time = time.time() - start
+    handler.close()
+    print('500 records logged in {0:.3f}s, {1}'.format(logging_time,
+                                                       handler))
+    assert logging_time < 0.25
+    assert target.messages == ['job {0} submitted'.format(i)
+                               for i in range(500)]
+    assert target.threads == set(['reana-log-writer'])
+    assert (handler.queued, handler.written, handler.dropped) == \
+        (500, 500, 0)
+
+
+def test_full_queue_drops_all_but_errors():
+    """Test the drop policy and its counters."""
+    target = SlowHandler(0.01)
+    handler = QueueLogHandler(target, maxsize=5, policy='drop')
+    logger = _logger(handler)
+    for i in range(100):
+        logger.debug('poll %d', i)
+    logger.error('job failed')
+    handler.close()
+    assert handler.dropped > 0
+    assert handler.queued + handler.dropped == 101
+    assert handler.written == handler.queued
+    assert target.messages[-1] == 'job failed'
+
+
+def test_records_reach_the_database(db_session):
+    """Test that records logged through the queue are stored."""
+    from reana_workflow_engine_cwl.database import SQLiteHandler
+    from reana_workflow_engine_cwl.models import WorkflowLog
+    handler = QueueLogHandler(SQLiteHandler(db_session,
+                                            db_session.workflow_uuid,
+                                            stream=io.StringIO()))
+    logger = _logger(handler)
+    for i in range(250):
+        logger.info(u'line %d', i)
+    handler.close()
+    logs = WorkflowLog.read_workflow_logs(db_session,
+                                          db_session.workflow_uuid)
+    assert len(logs.splitlines()) == 250
+
+
+def test_buffered_record_written_on_close(db_session):
+    """Test that closing right after a record writes it from the writer."""
+    from reana_workflow_engine_cwl.database import SQLiteHandler
+    from reana_workflow_engine_cwl.models import JobTiming, WorkflowLog
+    handler = QueueLogHandler(SQLiteHandler(db_session,
+                                            db_session.workflow_uuid,
+                                            stream=io.StringIO()))
+    logger = _logger(handler)
+    logger.info(u'workflow finished')
+    handler.close()
+    assert WorkflowLog.read_workflow_logs(
+        db_session, db_session.workflow_uuid) == u'workflow finished\n'
+    # the session is still usable from the thread which closed the handler
+    JobTiming.add_job_timings(db_session, db_session.workflow_uuid, [])
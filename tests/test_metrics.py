@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL metrics tests."""
+
+from __future__ import absolute_import, print_function
+
+import os
+import socket
+import time
+
+import requests
+
+from reana_workflow_engine_cwl import metrics
+from reana_workflow_engine_cwl.metrics import (Counter, Gauge, Histogram,
+                                               Registry, start_http_server,
+                                               write_textfile)
+
+
+def _registry():
+    registry = Registry()
+    requests_total = registry.register(
+        Counter('requests_total', 'Requests.', ['operation']))
+    in_flight = registry.register(Gauge('in_flight', 'Jobs in flight.'))
+    latency = registry.register(
+        Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1)))
+    requests_total.inc(operation='submit')
+    requests_total.inc(2, operation='status')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    return registry
+
+
+def test_prometheus_text_format():
+    """Test the exposition of counters, gauges and histograms."""
+    assert _registry().expose().splitlines() == [
+        '# HELP in_flight Jobs in flight.',
+        '# TYPE in_flight gauge',
+        'in_flight 1.0',
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3.0',
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{operation="status"} 2.0',
+        'requests_total{operation="submit"} 1.0',
+    ]
+
+
+def test_exporters(tmpdir):
+    """Test that metrics are served over HTTP and written to a file."""
+    registry = _registry()
+    server = start_http_server(0, '127.0.0.1', registry)
+    try:
+        response = requests.get(
+            'http://127.0.0.1:{0}/metrics'.format(server.server_port))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.headers['Content-Type'].startswith('text/plain')
+    assert response.text == registry.expose()
+
+    path = str(tmpdir.join('engine.prom'))
+    write_textfile(path, registry)
+    assert tmpdir.join('engine.prom').read() == registry.expose()
+
+
+def _free_ports(count):
+    """Return the first of ``count`` consecutive free ports."""
+    while True:
+        probe = socket.socket()
+        probe.bind(('', 0))
+        base = probe.getsockname()[1]
+        probe.close()
+        sockets = []
+        try:
+            for port in range(base, base + count):
+                sockets.append(socket.socket())
+                sockets[-1].bind(('', port))
+        except socket.error:
+            continue
+        finally:
+            for s in sockets:
+                s.close()
+        return base
+
+
+def _start_pool_process_exporters():
+    pid = metrics.REGISTRY.register(
+        Gauge('pool_process_pid', 'Process id of the pool process.'))
+    pid.set(os.getpid())
+    metrics.start_exporters()
+
+
+def _scrape(port, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return requests.get(
+                'http://127.0.0.1:{0}/metrics'.format(port)).text
+        except requests.ConnectionError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def test_pool_processes_serve_on_their_own_port(monkeypatch):
+    """Test that forked pool processes do not fight over METRICS_PORT."""
+    from billiard import Pool
+    base = _free_ports(2)
+    monkeypatch.setattr(metrics, 'METRICS_PORT', base)
+    pool = Pool(2, initializer=_start_pool_process_exporters)
+    try:
+        pids = [child.pid for child in pool._pool]
+        served = [_scrape(port) for port in (base, base + 1)]
+    finally:
+        pool.terminate()
+        pool.join()
+    served_pids = []
+    for text in served:
+        line = [line for line in text.splitlines()
+                if line.startswith('pool_process_pid ')][0]
+        served_pids.append(int(float(line.split()[1])))
+    assert sorted(served_pids) == sorted(pids)
+
+
+def test_job_controller_requests_measured(job_controller):
+    """Test that the latency of each job controller operation is known."""
+    from reana_workflow_engine_cwl.httpclient import (
+        REQUEST_ERRORS, REQUEST_SECONDS, ReanaJobControllerHTTPClient)
+    client = ReanaJobControllerHTTPClient(host=job_controller.host)
+    submitted = REQUEST_SECONDS.count(operation='submit')
+    checked = REQUEST_SECONDS.count(operation='status')
+    errors = REQUEST_ERRORS.get(operation='logs')
+    job_id = client.submit('default', 'busybox', 'true')
+    client.check_status(job_id)
+    client.get_logs('unknown-job')
+    assert REQUEST_SECONDS.count(operation='submit') == submitted + 1
+    assert REQUEST_SECONDS.count(operation='status') == checked + 1
+    assert REQUEST_ERRORS.get(operation='logs') == errors + 1
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+
+"""REANA-Workflow-Engine-CWL path translation tests."""
+
+from __future__ import absolute_import, print_function
+
+
+def test_longest_prefix_of_whole_components():
+    """Test that prefixes only match whole path components."""
+    from reana_workflow_engine_cwl.pathtranslation import PathTranslator
+    paths = PathTranslator()
+    paths.add('/var/spool/cwl', '/reana/w/outdir/')
+    paths.add('/var/spool/cwl/inputs/a.txt', '/reana/w/inputs/a.txt')
+    assert paths.translate_path('/var/spool/cwl') == '/reana/w/outdir'
+    assert paths.translate_path('/var/spool/cwl/') == '/reana/w/outdir/'
+    assert paths.translate_path('/var/spool/cwl/out.csv') == \
+        '/reana/w/outdir/out.csv'
+    assert paths.translate_path('/var/spool/cwl/inputs/a.txt') == \
+        '/reana/w/inputs/a.txt'
+    assert paths.translate_path('/var/spool/cwl/inputs/a.txt.bai') == \
+        '/reana/w/outdir/inputs/a.txt.bai'
+    assert paths.translate_path('/var/spool/cwl2/x') == '/var/spool/cwl2/x'
+    assert paths.translate_path('/var/spool') == '/var/spool'
+
+
+def test_paths_in_arguments():
+    """Test that every path of an argument is translated, and only paths."""
+    from reana_workflow_engine_cwl.pathtranslation import PathTranslator
+    paths = PathTranslator()
+    paths.add('/var/spool/cwl', '/reana/w/outdir')
+    paths.add('/tmp', '/reana/w/tmp')
+    assert paths.translate('--out=/var/spool/cwl/a,/var/spool/cwl/b') == \
+        '--out=/reana/w/outdir/a,/reana/w/outdir/b'
+    assert paths.translate('PATH=/tmp/bin:/usr/bin') == \
+        'PATH=/reana/w/tmp/bin:/usr/bin'
+    assert paths.translate('"/tmp/x y" </tmp/in') == \
+        '"/reana/w/tmp/x y" </reana/w/tmp/in'
+    # relative paths and URLs are not paths of the job
+    assert paths.translate('data/tmp/x') == 'data/tmp/x'
+    assert paths.translate('http://host/tmp/x') == 'http://host/tmp/x'
+    assert paths.translate('/scratch/tmp/x') == '/scratch/tmp/x'
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL pipeline tests."""
+
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+import time
+
+
+def _stub_job(pipeline, duration):
+    """Register a job which finishes after ``duration`` seconds."""
+    pipeline.job_started()
+
+    def run():
+        time.sleep(duration)
+        pipeline.job_finished()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    pipeline.add_thread(thread)
+    thread.start()
+
+
+def _cpu_time():
+    """Return user and system CPU time consumed by this process."""
+    times = os.times()
+    return times[0] + times[1]
+
+
+def test_wait_returns_when_jobs_finish():
+    """Test that wait() returns once all registered jobs are done."""
+    from reana_workflow_engine_cwl.pipeline import Pipeline
+    pipeline = Pipeline()
+    for duration in (0.1, 0.2, 0.3):
+        _stub_job(pipeline, duration)
+    pipeline.wait()
+    assert pipeline.pending_jobs == 0
+    assert all(not t.is_alive() for t in pipeline.threads)
+
+
+def test_wait_does_not_burn_cpu():
+    """Benchmark CPU usage of wait() during a long-running stub job."""
+    from reana_workflow_engine_cwl.pipeline import Pipeline
+    pipeline = Pipeline()
+    _stub_job(pipeline, 2)
+    wall_start = time.time()
+    cpu_start = _cpu_time()
+    pipeline.wait()
+    cpu_used = _cpu_time() - cpu_start
+    wall_used = time.time() - wall_start
+    print('wait(): {0:.2f}s wall, {1:.3f}s CPU'.format(wall_used, cpu_used))
+    assert wall_used >= 1.9
+    assert cpu_used < 0.1 * wall_used
+
+
+class _StubRunnable(object):
+    """Runnable which completes a chain step after a short delay."""
+
+    outdir = None
+
+    def __init__(self, pipeline, done, duration):
+        self.pipeline = pipeline
+        self.done = done
+        self.duration = duration
+
+    def run(self, **kwargs):
+        self.pipeline.job_started()
+
+        def finish():
+            time.sleep(self.duration)
+            self.done.append(True)
+            self.pipeline.job_finished()
+
+        thread = threading.Thread(target=finish)
+        thread.daemon = True
+        self.pipeline.add_thread(thread)
+        thread.start()
+
+
+class _StubChainTool(object):
+    """Tool whose steps form a linear chain of dependent jobs."""
+
+    metadata = {}
+
+    def __init__(self, pipeline, steps, duration):
+        self.pipeline = pipeline
+        self.steps = steps
+        self.duration = duration
+        self.requirements = []
+
+    def job(self, job_order, output_callback, **kwargs):
+        done = []
+        for step in range(self.steps):
+            yield _StubRunnable(self.pipeline, done, self.duration)
+            while len(done) <= step:
+                yield None
+        output_callback({}, "success")
+
+
+def test_executor_dispatches_on_job_completion(tmpdir):
+    """Test that a dependent step starts right after its upstream ends."""
+    from reana_workflow_engine_cwl.pipeline import Pipeline
+    pipeline = Pipeline()
+    pipeline.working_dir = str(tmpdir)
+    tool = _StubChainTool(pipeline, steps=20, duration=0.01)
+    start = time.time()
+    output, status = pipeline.executor(tool, {}, basedir=str(tmpdir),
+                                       rm_tmpdir=True)
+    elapsed = time.time() - start
+    print('20-step chain: {0:.2f}s'.format(elapsed))
+    assert status == "success"
+    assert elapsed < 2
+
+
+def test_outputs_relocated_in_parallel(tmpdir):
+    """Test that outputs of many steps are moved and cleaned up."""
+    from cwltool.stdfsaccess import StdFsAccess
+    from reana_workflow_engine_cwl.pipeline import Pipeline
+    pipeline = Pipeline()
+    output_dirs = set()
+    output = {'histograms': []}
+    intermediate_outdir = tmpdir.mkdir('outdir')
+    for i in range(200):
+        step_dir = intermediate_outdir.mkdir('step{0}'.format(i))
+        step_dir.join('h{0}.root'.format(i)).write('x' * i)
+        output_dirs.add(str(step_dir))
+        output['histograms'].append({
+            'class': 'File', 'basename': 'h{0}.root'.format(i),
+            'location': 'file://' + str(step_dir.join('h{0}.root'.format(i)))
+        })
+    kept = intermediate_outdir.mkdir('kept')
+    kept.join('intermediate.txt').write('x')
+    output_dirs.add(str(kept))
+    final_outdir = tmpdir.mkdir('outputs')
+
+    start = time.time()
+    pipeline.relocate_outputs(output, str(final_outdir), output_dirs,
+                              'move', StdFsAccess(''))
+    pipeline.clean_intermediate(output_dirs)
+    print('relocated 200 outputs in {0:.3f}s'.format(time.time() - start))
+
+    for i, histogram in enumerate(output['histograms']):
+        path = str(final_outdir.join('h{0}.root'.format(i)))
+        assert histogram['location'] == 'file://' + path
+        assert os.path.getsize(path) == i
+    assert intermediate_outdir.listdir() == [kept]
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL status polling tests."""
+
+from __future__ import absolute_import, print_function
+
+import threading
+
+from reana_workflow_engine_cwl.poll import PollPolicy, PollThread
+
+
+class StubPoll(PollThread):
+    """Poll thread answering from an in-memory table of job states."""
+
+    def __init__(self, states, **kwargs):
+        super(StubPoll, self).__init__(**kwargs)
+        self.states = states
+        self.batches = []
+
+    def poll(self, operation_ids):
+        self.batches.append(len(operation_ids))
+        return dict((i, {'job_id': i, 'status': self.states[i]})
+                    for i in operation_ids if i in self.states)
+
+    def is_done(self, polled):
+        return polled.operation['status'] in ('succeeded', 'failed')
+
+    def complete(self, polled):
+        polled.callback()
+
+
+def test_single_thread_polls_in_bounded_batches():
+    """Test that many operations are polled by one thread in batches."""
+    job_ids = ['job-{0}'.format(i) for i in range(250)]
+    states = dict((i, 'succeeded') for i in job_ids)
+    poller = StubPoll(states, poll_batch_size=100,
+                      policy=PollPolicy(initial_interval=0.01, jitter=0))
+    completed = []
+    all_done = threading.Event()
+
+    def callback(job_id):
+        completed.append(job_id)
+        if len(completed) == len(job_ids):
+            all_done.set()
+
+    threads_before = threading.active_count()
+    for job_id in job_ids:
+        poller.watch({'job_id': job_id, 'status': 'queued'},
+                     lambda job_id=job_id: callback(job_id))
+    poller.start()
+    assert threading.active_count() == threads_before + 1
+    assert all_done.wait(10)
+    poller.stop()
+    poller.join(1)
+    assert sorted(completed) == sorted(job_ids)
+    assert max(poller.batches) <= 100
+
+
+def test_operation_given_up_after_poll_retries():
+    """Test that an operation which cannot be polled is still completed."""
+    poller = StubPoll({}, poll_retries=2,
+                      policy=PollPolicy(initial_interval=0.01, factor=1))
+    done = threading.Event()
+    polled = poller.watch({'job_id': 'lost', 'status': 'queued'}, done.set)
+    poller.start()
+    assert done.wait(5)
+    poller.stop()
+    assert polled.retries < 0
+    assert not poller.operations
+
+
+def test_poll_policy_backoff():
+    """Test that poll intervals grow up to the maximum interval."""
+    policy = PollPolicy(initial_interval=1, factor=2, max_interval=10,
+                        jitter=0)
+    intervals = [policy.first_interval()]
+    for _ in range(5):
+        intervals.append(policy.next_interval(intervals[-1]))
+    assert intervals == [1, 2, 4, 8, 10, 10]
+
+
+def test_poll_policy_runtime_history():
+    """Test that the first poll is delayed for tools known to run long."""
+    policy = PollPolicy(initial_interval=1, use_history=True,
+                        history_fraction=0.5)
+    assert policy.first_interval('#long') == 1
+    policy.record('#long', 3600)
+    assert policy.first_interval('#long') == 1800
+    assert policy.first_interval('#other') == 1
+
+
+def test_poll_counts_with_backoff():
+    """Test that a long-running operation consumes few polls."""
+    states = {'job': 'started'}
+    poller = StubPoll(states, policy=PollPolicy(initial_interval=0.01,
+                                                factor=2, max_interval=0.2))
+    done = threading.Event()
+    poller.watch({'job_id': 'job', 'status': 'queued'}, done.set)
+    poller.start()
+    threading.Timer(1, states.update, kwargs={'job': 'succeeded'}).start()
+    assert done.wait(5)
+    poller.stop()
+    # polling every 0.01s without backoff would take about 100 polls
+    assert poller.poll_counts['job'] < 15
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL profiling tests."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import time
+
+
+def test_nested_phases_are_not_counted_twice():
+    """Test that a phase excludes the time of the phases run inside it."""
+    from reana_workflow_engine_cwl.profiling import PhaseTimer
+    phases = PhaseTimer()
+    with phases.phase('dispatch'):
+        time.sleep(0.05)
+        with phases.phase('waiting'):
+            time.sleep(0.1)
+    with phases.phase('dispatch'):
+        time.sleep(0.05)
+    timings = dict(phases.as_list())
+    assert [name for name, _ in phases.as_list()] == ['dispatch', 'waiting']
+    assert 0.1 <= timings['dispatch'] < 0.15
+    assert 0.1 <= timings['waiting'] < 0.15
+
+
+def test_timed_calls_are_restored():
+    """Test that calls are timed within the block only."""
+    from reana_workflow_engine_cwl import profiling
+    phases = profiling.PhaseTimer()
+
+    class Module(object):
+        @staticmethod
+        def load(path):
+            time.sleep(0.05)
+            return path
+
+    with profiling.timed_calls(Module, 'load', phases, 'loading'):
+        assert Module.load('workflow.json') == 'workflow.json'
+    Module.load('workflow.json')
+    assert 0.05 <= dict(phases.as_list())['loading'] < 0.1
+
+
+def test_executor_phases(tmpdir):
+    """Test that the executor accounts its time to its phases."""
+    from reana_workflow_engine_cwl.pipeline import Pipeline
+    from test_pipeline import _StubChainTool
+    pipeline = Pipeline()
+    pipeline.working_dir = str(tmpdir)
+    tool = _StubChainTool(pipeline, steps=5, duration=0.05)
+    pipeline.executor(tool, {}, basedir=str(tmpdir), rm_tmpdir=True)
+    print(pipeline.phases)
+    timings = dict(pipeline.phases.as_list())
+    assert sorted(timings) == ['dispatch', 'relocation', 'waiting']
+    assert timings['waiting'] >= 0.2
+    assert timings['dispatch'] < timings['waiting']
+
+
+def test_profile_written(tmpdir):
+    """Test that the profile and the phase timings are written."""
+    from reana_workflow_engine_cwl.profiling import WorkflowProfile
+    profile = WorkflowProfile()
+    with profile:
+        with profile.timer.phase('loading'):
+            sorted(range(100000), key=lambda i: -i)
+    profile_dir = str(tmpdir.join('profile'))
+    text_path = profile.write(profile_dir)
+
+    with open(os.path.join(profile_dir, 'phases.json')) as f:
+        phases = json.load(f)
+    assert [p['name'] for p in phases['phases']] == ['loading', 'other']
+    assert sum(p['seconds'] for p in phases['phases']) == \
+        phases['wall_time']
+    assert os.path.getsize(os.path.join(profile_dir, 'profile.pstats'))
+    with open(text_path) as f:
+        text = f.read()
+    assert 'loading' in text
+    assert 'sorted' in text
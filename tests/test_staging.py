@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL input staging tests."""
+
+from __future__ import absolute_import, print_function
+
+import os
+
+from reana_workflow_engine_cwl.staging import (StagingMetrics, move_path,
+                                               stage_file, stage_tree,
+                                               sync_directory)
+
+
+def test_hardlink_is_preferred(tmpdir):
+    """Test that a hardlink is made when it comes first."""
+    src = tmpdir.join('input.root')
+    src.write('x' * 1000)
+    metrics = StagingMetrics()
+    strategy = stage_file(str(src), str(tmpdir.join('staged.root')),
+                          ('hardlink', 'copy'), metrics)
+    assert strategy == 'hardlink'
+    assert os.stat(str(src)).st_nlink == 2
+    assert (metrics.bytes_linked, metrics.bytes_copied) == (1000, 0)
+
+
+def test_fallback_to_copy(tmpdir):
+    """Test that files are copied when no link can be made."""
+    src = tmpdir.join('input.root')
+    src.write('x' * 1000)
+    metrics = StagingMetrics()
+    # linking onto an existing file fails, copying overwrites it
+    dst = tmpdir.join('staged.root')
+    dst.write('old')
+    strategy = stage_file(str(src), str(dst), ('hardlink', 'copy'), metrics)
+    assert strategy == 'copy'
+    assert dst.read() == 'x' * 1000
+    assert (metrics.bytes_linked, metrics.bytes_copied) == (0, 1000)
+
+
+def test_stage_tree(tmpdir):
+    """Test that directory trees are staged file by file."""
+    src = tmpdir.mkdir('data')
+    src.join('a.txt').write('a')
+    src.mkdir('sub').join('b.txt').write('bb')
+    metrics = StagingMetrics()
+    stage_tree(str(src), str(tmpdir.join('staged')), ('reflink', 'copy'),
+               metrics)
+    assert tmpdir.join('staged', 'sub', 'b.txt').read() == 'bb'
+    assert metrics.files_copied + metrics.files_linked == 2
+    assert metrics.bytes_copied + metrics.bytes_linked == 3
+
+
+def test_sync_directory_is_incremental(tmpdir):
+    """Test that only new and changed files are synced again."""
+    src = tmpdir.mkdir('code')
+    dst = tmpdir.mkdir('inputs')
+    manifest = str(tmpdir.join('manifest.json'))
+    for i in range(20):
+        src.join('file-{0}.py'.format(i)).write('x' * 100)
+    metrics = sync_directory(str(src), str(dst), manifest, ('copy',))
+    assert metrics.files_copied == 20
+
+    src.join('file-0.py').write('y' * 200)
+    src.join('file-1.py').write('x' * 100)
+    os.utime(str(src.join('file-1.py')), (0, 0))
+    src.join('new.py').write('z')
+    metrics = sync_directory(str(src), str(dst), manifest, ('copy',))
+    print(metrics)
+    # file-1.py was touched but is unchanged
+    assert metrics.files_copied == 2
+    assert metrics.files_unchanged == 19
+    assert dst.join('file-0.py').read() == 'y' * 200
+    assert dst.join('new.py').read() == 'z'
+
+    # a copy modified in place, keeping its size and modification time
+    stat = os.stat(str(dst.join('file-2.py')))
+    dst.join('file-2.py').write('w' * 100)
+    os.utime(str(dst.join('file-2.py')), (stat.st_atime, stat.st_mtime))
+    metrics = sync_directory(str(src), str(dst), manifest, ('copy',))
+    assert metrics.files_copied == 1
+    assert dst.join('file-2.py').read() == 'x' * 100
+
+
+def test_move_path_merges_directories(tmpdir):
+    """Test that a directory moved onto an existing one is merged."""
+    src = tmpdir.mkdir('step').mkdir('plots')
+    src.join('a.png').write('a')
+    dst = tmpdir.mkdir('outputs').mkdir('plots')
+    dst.join('b.png').write('b')
+    move_path(str(src), str(dst))
+    assert sorted(p.basename for p in dst.listdir()) == ['a.png', 'b.png']
+    assert not src.listdir()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of REANA.
+# Copyright (C) 2018 CERN.
+#
+# REANA is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# REANA is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with REANA; if not, see <http://www.gnu.org/licenses>.
+#
+# In applying this license, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+
+"""REANA-Workflow-Engine-CWL job status subscription tests."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import threading
+import time
+
+from reana_workflow_engine_cwl.poll import PollPolicy, PollThread
+
+
+class StubPoll(PollThread):
+    """Poll thread for which polling never reports an end state."""
+
+    def poll(self, operation_ids):
+        return dict((i, {'job_id': i, 'status': 'started'})
+                    for i in operation_ids)
+
+    def is_done(self, polled):
+        return polled.operation['status'] in ('succeeded', 'failed')
+
+    def complete(self, polled):
+        polled.callback()
+
+
+def test_pushed_job_completion():
+    """Measure completion latency of a job whose end state is pushed."""
+    import zmq
+    from reana_workflow_engine_cwl import celery_zeromq
+    from reana_workflow_engine_cwl.zeromq_tracker import ZeroMQJobSubscriber
+
+    publisher = celery_zeromq.get_context().socket(zmq.PUB)
+    port = publisher.bind_to_random_port('tcp://127.0.0.1')
+    poller = StubPoll(policy=PollPolicy(initial_interval=30))
+    subscriber = ZeroMQJobSubscriber('tcp://127.0.0.1:{0}'.format(port),
+                                     poller.notify)
+    done = threading.Event()
+    poller.watch({'job_id': 'job-1', 'status': 'queued'}, done.set)
+    poller.start()
+    subscriber.start()
+    try:
+        message = json.dumps({'job_id': 'job-1', 'status': 'succeeded'})
+        # messages sent before the subscription is set up are dropped,
+        # so publish until one arrives
+        for _ in range(100):
+            published = time.time()
+            publisher.send_string(message)
+            if done.wait(0.05):
+                break
+        latency = time.time() - published
+    finally:
+        subscriber.stop()
+        poller.stop()
+        subscriber.join()
+        publisher.close()
+    print('completion latency: {0:.3f}s'.format(latency))
+    assert done.is_set()
+    assert latency < 0.5
+    assert poller.poll_counts['job-1'] == 0
+
+
+def test_state_pushed_before_watch():
+    """Test that a state pushed before the job is watched is not lost."""
+    poller = StubPoll(policy=PollPolicy(initial_interval=30))
+    poller.notify({'job_id': 'job-1', 'status': 'succeeded'})
+    done = threading.Event()
+    poller.watch({'job_id': 'job-1', 'status': 'queued'}, done.set)
+    poller.start()
+    try:
+        assert done.wait(1)
+    finally:
+        poller.stop()
+    assert poller.poll_counts['job-1'] == 0
+    assert not poller.unknown